@@ -1,6 +1,6 @@
 import math
 import copy
-import warnings
+import tracer
 import numpy as np
 from itertools import product
 
@@ -1207,19 +1207,19 @@ class InferValue:
 
     @staticmethod
     def iteratortostringhandle(args: list, node):
-        warnings.warn("iteratortostringhandle not implemented", RuntimeWarning)
+        tracer.warn("NotImplemented", node.name)
 
     @staticmethod
     def noop(args: list, node):
-        warnings.warn("noop not implemented", RuntimeWarning)
+        tracer.warn("NotImplemented", node.name)
 
     @staticmethod
     def restorev2(args: list, node):
-        warnings.warn("restorev2 not implemented", RuntimeWarning)
+        tracer.warn("NotImplemented", node.name)
 
     @staticmethod
     def savev2(args: list, node):
-        warnings.warn("savev2 not implemented", RuntimeWarning)
+        tracer.warn("NotImplemented", node.name)
 
     # non linear operations:
     @staticmethod
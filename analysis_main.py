@@ -1,145 +1,254 @@
-import z3
-import math
+import argparse
+import json
 import sys
-import os
 
+import checker
+import parse.parse_graph
 from parse.parse_graph import Graph
+from parse.graph_loader import network_name as get_network_name
+from parse.graph_cache import default_cache_dir
 import parse.parse_format_text
+import parse.range_spec
 from parse.specified_ranges import SpecifiedRanges
-from solver import Range, meet
-from utils import OVERFLOW_LIMIT, UNDERFLOW_LIMIT
+import tracer
+
+# the settings analyzed by run_all_configs, in the order they are reported
+SETTINGS = [None, "unbounded_weight", "unbounded_input"]
+# the name of the setting analyzing all of SETTINGS in the batch runs of main.py
+ALL_CONFIGS = "all_configs"
+
+
+# returns the name of setting in the reports.
+def setting_name(setting):
+    return setting or "bounded"
+
+
+# sets the ranges of the weights and the inputs to be unbounded or not according to setting (see reset).
+def set_setting(setting):
+    parse.parse_format_text.unbounded_weight = setting == "unbounded_weight"
+    parse.parse_format_text.unbounded_input = setting == "unbounded_input"
+
+
+# resets the global state of the analysis for the network network_name in setting (None, "unbounded_weight" or
+# "unbounded_input"), so that several networks can be analyzed one after another in the same process. The ranges of
+# inputs are looked up in range_spec (a RangeSpec, see parse/range_spec.py) and then in SpecifiedRanges, and the ones
+# not found are asked at the console if range_spec is None.
+def reset(network_name, setting=None, range_spec=None):
+    parse.parse_format_text.placeholder_map.clear()
+    parse.parse_format_text.weight_sources.clear()
+    parse.parse_format_text.input_sources.clear()
+    set_setting(setting)
+    builtin = SpecifiedRanges.specified_ranges.get(network_name, {})
+    if range_spec is None:
+        range_spec = parse.range_spec.RangeSpec({})
+    SpecifiedRanges.ranges_looking_up = range_spec.table(network_name, builtin)
+    parse.parse_format_text.dtype_ranges = range_spec.dtypes
+    parse.parse_format_text.range_policy = range_spec.policy
+    parse.parse_format_text.default_range = range_spec.default
+    tracer.clear_warnings()
+
+
+# analyzes the graph in filename and returns a record of the results: the name of the network, the numbers of all,
+# warned and safe unsafe operations, the warned unsafe operations and the aggregated warnings of the analysis (see
+# tracer.summary). If verbose is True, the information of the graph and the warned unsafe operations are printed at
+# the end. If stream is a file, a JSON line is written to it for every checked unsafe operation as soon as its verdict
+# is known (see checker.check_each). range_spec is passed to reset. The other arguments are the same as the command
+# line options.
+def run(filename, setting=None, signature=None, tags=None, cache_dir=None, jobs=1, deterministic=False, verbose=True,
+        stream=None, range_spec=None):
+    network_name = get_network_name(filename)
+    reset(network_name, setting, range_spec)
+    graph = Graph(filename, signature=signature, tags=tags, cache_dir=cache_dir)
+    suspected_nodes = checker.find_suspects(graph)
+    if verbose:
+        print(graph.get_info())
+    return check_graph(graph, network_name, suspected_nodes, setting, jobs, deterministic, verbose, stream)
+
+
+# checks suspected_nodes in graph in setting and returns the record of the results (see run). The warnings of the
+# analysis already in tracer are kept.
+def check_graph(graph, network_name, suspected_nodes, setting, jobs, deterministic, verbose, stream):
+    # the dataflow analysis is shared by all suspects, and the suspects are checked (in parallel if jobs > 1)
+    verdicts = {}
+    for (suspected_node_id, is_safe, details) in checker.check_each(graph, suspected_nodes, jobs, deterministic):
+        verdicts[suspected_node_id] = is_safe
+        if stream is not None:
+            line = {"network": network_name, "setting": setting, "op": graph.nodes[suspected_node_id].op,
+                    "name": graph.node_names[suspected_node_id], "safe": is_safe}
+            line.update(details)
+            stream.write(json.dumps(line) + "\n")
+            stream.flush()
+
+    record = {"network": network_name, "all": 0, "warnings": 0, "safe": 0, "warned": []}
+    for suspected_node_id in filter(verdicts.__contains__, suspected_nodes):
+        is_safe = verdicts[suspected_node_id]
+        suspected_node = graph.nodes[suspected_node_id]
+        if not is_safe:
+            if verbose:
+                print(suspected_node.op, suspected_node.name)
+                print("warning")
+            record["warned"].append({"op": suspected_node.op, "name": suspected_node.name})
+            record["warnings"] += 1
+        else:
+            record["safe"] += 1
+        record["all"] += 1
+    record["analysis_warnings"] = tracer.summary()
+    return record
+
+
+# analyzes the graph in filename in all SETTINGS with one parsed graph, and returns {"network": the name of the
+# network, "configs": the records of SETTINGS (see run) with their settings}. The settings are analyzed in the order
+# unbounded_weight, bounded, unbounded_input, so that only the weights or only the inputs change from one setting to
+# the next: the results of dataflow analysis of the nodes depending on the changed sources are forgotten (see
+# Graph.invalidate), and the results of the other nodes are shared. The arguments are the same as run.
+def run_all_configs(filename, signature=None, tags=None, cache_dir=None, jobs=1, deterministic=False, verbose=True,
+                    stream=None, range_spec=None):
+    network_name = get_network_name(filename)
+    reset(network_name, None, range_spec)
+    graph = Graph(filename, signature=signature, tags=tags, cache_dir=cache_dir)
+    suspected_nodes = checker.find_suspects(graph)
+    if verbose:
+        print(graph.get_info())
+
+    records = {}
+    # the warnings of dataflow analysis of the nodes whose results are kept, as a dict from (reason, name) to None
+    node_warnings = {}
+    order = ["unbounded_weight", None, "unbounded_input"]
+    for (previous, setting) in zip([None] + order, order):
+        set_setting(setting)
+        if setting != order[0]:
+            sources = []
+            if (previous == "unbounded_weight") != (setting == "unbounded_weight"):
+                sources += parse.parse_format_text.weight_sources
+            if (previous == "unbounded_input") != (setting == "unbounded_input"):
+                sources += parse.parse_format_text.input_sources
+            invalidated = {graph.node_names[son] for son in graph.invalidate([graph.node_ids[x] for x in sources])}
+            node_warnings = {key: None for key in node_warnings if key[1] not in invalidated}
+
+        # the dataflow analysis of the nodes not kept comes first, so that its warnings are kept with the nodes. Only
+        # the suspects whose slices have forgotten nodes are analyzed again, with the slice index of the first setting.
+        tracer.clear_warnings()
+        checker.analyze(graph, [x for x in suspected_nodes if not checker.is_analyzed(graph, x)])
+        for (reason, names) in tracer.take_warnings().items():
+            node_warnings.update(((reason, name), None) for name in names)
+        for (reason, name) in node_warnings:
+            tracer.merge_warnings({reason: [name]})
+
+        if verbose:
+            print("setting:", setting_name(setting))
+        records[setting] = check_graph(graph, network_name, suspected_nodes, setting, jobs, deterministic, verbose,
+                                       stream)
+        records[setting]["setting"] = setting
+    return {"network": network_name, "configs": [records[setting] for setting in SETTINGS]}
+
+
+# returns the lines of the report of run_all_configs: the verdicts of every warned unsafe operation in all settings
+# side by side, and the summary of every setting.
+def all_configs_report(result):
+    warned = [{(x["op"], x["name"]) for x in record["warned"]} for record in result["configs"]]
+    rows = [("operation", "name") + tuple(setting_name(record["setting"]) for record in result["configs"])]
+    for (op, name) in dict.fromkeys((x["op"], x["name"]) for record in result["configs"] for x in record["warned"]):
+        rows.append((op, name) + tuple("warning" if (op, name) in x else "safe" for x in warned))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = ["  ".join(x.ljust(width) for (x, width) in zip(row, widths)).rstrip() for row in rows]
+    for record in result["configs"]:
+        lines.append("%s , %s , all:  %d \twarnings:  %d \tsafe:  %d" % (
+            result["network"], setting_name(record["setting"]), record["all"], record["warnings"], record["safe"]))
+    return lines
+
 
 if __name__ == "__main__":
-    sys.setrecursionlimit(100000)
-    try:
-        assert len(sys.argv) >= 2 and len(sys.argv) <= 3
-        pbtxt = sys.argv[1]
-        assert pbtxt[-6:] == ".pbtxt"
-        if len(sys.argv) == 3:
-            assert sys.argv[2] in ["unbounded_weight", "unbounded_input"]
-            if sys.argv[2] == "unbounded_weight":
-                parse.parse_format_text.unbounded_weight = True
-            else:
-                parse.parse_format_text.unbounded_input = True
-
-    except:
-        print(
-            "Please run 'python analysis_main.py PBTXT_FILENAME'.\nAborted...")
-        exit(1)
-
-    rule = ["Log", "Exp", "RealDiv", "Sqrt", "Rsqrt", "Expm1", "Log1p", "Reciprocal"]
-
-    network_name = os.path.basename(pbtxt)[:-6]
-    if network_name in SpecifiedRanges.specified_ranges:
-        SpecifiedRanges.ranges_looking_up = SpecifiedRanges.specified_ranges[network_name]
-
-    graph = Graph(pbtxt, "verbose.txt")
-    suspected_nodes = []
-    for node in graph.graph_def.node:
-        if node.op in rule and graph.f.find(node.name) == graph.main_clique:
-            suspected_nodes.append(node)
-    print(graph.get_info())
-
-    cnt_all = 0
-    cnt_sat = 0
-    cnt_unknown = 0
-    cnt_unsat = 0
-    for suspected_node in suspected_nodes:
-        # calculate the range of input of the unsafe operations
-        if suspected_node.op in ["RealDiv", "Floormod"]:
-            # special treatment for div because we only care about the denominator
-            ret = graph.forward_analysis(graph.node_by_name[graph.graph_backward[0][suspected_node.name][1]],
-                                         suspected_node)
-        else:
-            ret = graph.forward_analysis(suspected_node)
-        if ret is None:
-            continue
-
-        if suspected_node.op in ["Exp", "Expm1"]:
-            suspected_node_input = Range(left=math.log(OVERFLOW_LIMIT), right=None, const_type=0)
-            backward_analysis_const_start = graph.graph_backward[0][suspected_node.name][0]
-            index = graph.edge_index[suspected_node.name][0]
-        elif suspected_node.op in ["RealDiv", "Floormod"]:
-            suspected_node_input = Range(left=-UNDERFLOW_LIMIT, right=UNDERFLOW_LIMIT, const_type=0)
-            backward_analysis_const_start = graph.graph_backward[0][suspected_node.name][1]
-            index = graph.edge_index[suspected_node.name][1]
-        elif suspected_node.op == "Log":
-            suspected_node_input = Range(left=None, right=UNDERFLOW_LIMIT, const_type=0)
-            backward_analysis_const_start = graph.graph_backward[0][suspected_node.name][0]
-            index = graph.edge_index[suspected_node.name][0]
-        elif suspected_node.op == "Sqrt":
-            suspected_node_input = Range(left=None, right=-UNDERFLOW_LIMIT, const_type=0)
-            backward_analysis_const_start = graph.graph_backward[0][suspected_node.name][0]
-            index = graph.edge_index[suspected_node.name][0]
-        elif suspected_node.op == "Rsqrt":
-            suspected_node_input = Range(left=None, right=UNDERFLOW_LIMIT, const_type=0)
-            backward_analysis_const_start = graph.graph_backward[0][suspected_node.name][0]
-            index = graph.edge_index[suspected_node.name][0]
-        elif suspected_node.op == "Log1p":
-            suspected_node_input = Range(left=-UNDERFLOW_LIMIT - 1, right=UNDERFLOW_LIMIT - 1, const_type=0)
-            backward_analysis_const_start = graph.graph_backward[0][suspected_node.name][0]
-            index = graph.edge_index[suspected_node.name][0]
-        elif suspected_node.op == "Reciprocal":
-            suspected_node_input = Range(left=-UNDERFLOW_LIMIT, right=UNDERFLOW_LIMIT, const_type=0)
-            backward_analysis_const_start = graph.graph_backward[0][suspected_node.name][0]
-            index = graph.edge_index[suspected_node.name][0]
-        else:
-            raise NotImplementedError("No rule for ", suspected_node.op)
-
-
-        # check whether the input_range intersects with its danger zone
-        # return true if dose no intersect; otherwise, return false
-        def is_valid(input_range):
-            additional_constraint = meet(input_range, suspected_node_input)
-            S = z3.Solver()
-            S.add(additional_constraint)
-            ans = S.check()
-            assert ans != z3.unknown
-            return ans == z3.unsat
-
-
-        # check whether the unsafe operation's input is valid
-        def is_valid_by_split():
-            # if it is valid without predicate splitting
-            if is_valid(graph.node_output[backward_analysis_const_start].index_of(index).value):
-                return True
-            else:
-                # otherwise, try predicate splitting
-                range_to_split, nodes_interested = ret
-                range_to_split = list(range_to_split)
-                for name in range_to_split:
-                    override_dict = {}
-                    # if the name has |, we have to remove it to get the name in the graph
-                    changed = set()
-                    if name.find('|') != -1:
-                        changed.add(name[:name.find('|')])
-                    else:
-                        changed.add(name)
-                    value = graph.get_value(name)
-                    if value.left < 0 and value.right > 0:
-                        spans = [Range(left=value.left, right=0), Range(left=0, right=value.right)]
-                        is_span_valid = True
-                        for span in spans:
-                            override_dict[name] = span
-                            # incrementally rerun the dataflow analysis on changed node set with the node output
-                            # overridden to override_dict
-                            node_out = graph.reevaluate(nodes_interested, backward_analysis_const_start, changed,
-                                                        override_dict)
-                            if not is_valid(node_out.index_of(index).value):
-                                is_span_valid = False
-                                break
-
-                        if is_span_valid:
-                            return True
-
-                return False
-
-
-        if not is_valid_by_split():
-            print(suspected_node.op, suspected_node.name)
-            print("warning")
-            cnt_sat += 1
-        else:
-            cnt_unsat += 1
-        cnt_all += 1
-    print(network_name, ", all: ", cnt_all, "\twarnings: ", cnt_sat, "\tsafe: ", cnt_unsat)
+    parser = argparse.ArgumentParser(description="DEBAR: detecting numerical bugs in neural network architectures.")
+    parser.add_argument("filename",
+                        help="the computation graph: a GraphDef (.pbtxt or .pb), a MetaGraphDef (.meta) or a "
+                             "SavedModel (the export directory or its saved_model.pb)")
+    parser.add_argument("setting", nargs="?", choices=["unbounded_weight", "unbounded_input"],
+                        help="leave the weights or the inputs unbounded")
+    parser.add_argument("--signature", default=None,
+                        help="only analyze the subgraph computing the outputs of this signature (MetaGraphDef and "
+                             "SavedModel only)")
+    parser.add_argument("--tags", default=None,
+                        help="comma separated tags choosing the MetaGraphDef in a SavedModel")
+    parser.add_argument("--tensorflow-shapes", action="store_true",
+                        help="import the graph into TensorFlow to obtain the shapes of tensors instead of inferring "
+                             "them from the graph")
+    parser.add_argument("--cache-dir", default=None,
+                        help="the directory of cached graphs (default: $DEBAR_CACHE_DIR or ~/.cache/debar)")
+    parser.add_argument("--no-cache", action="store_true", help="always parse and build the graph from scratch")
+    parser.add_argument("--trace", default="off", choices=sorted(tracer.LEVELS, key=tracer.LEVELS.get),
+                        help="trace the evaluated nodes (node) and also their abstracted outputs (value)")
+    parser.add_argument("--trace-file", default=None,
+                        help="write the trace to this file instead of stderr, as JSON lines if it ends with .jsonl")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="check the predicate splits of the unsafe operations in this number of worker "
+                             "processes after the shared dataflow analysis")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="with --jobs, evaluate the same predicate splits as a sequential run regardless of the "
+                             "scheduling, so that the reports are reproducible")
+    parser.add_argument("--split-attempts", type=int, default=None,
+                        help="try at most this number of predicate splitting candidates for every unsafe operation, "
+                             "the ones with the smallest forward cones first (default: unlimited)")
+    parser.add_argument("--split-time", type=float, default=None,
+                        help="spend at most this number of seconds on predicate splitting for every unsafe operation "
+                             "(default: unlimited)")
+    parser.add_argument("--split-depth", type=int, default=0,
+                        help="split the spans which are still not valid again, down to this number of levels "
+                             "(default: 0, only split at 0)")
+    parser.add_argument("--split-ways", type=int, default=2,
+                        help="the number of spans of equal width a span is split into by --split-depth (default: 2)")
+    parser.add_argument("--split-pairs", action="store_true",
+                        help="also split the pairs of predicate splitting candidates together")
+    parser.add_argument("--stream", default=None,
+                        help="write a JSON line to this file (- for stdout) for every unsafe operation as soon as it "
+                             "is checked: its verdict, input interval, danger zone, whether predicate splitting was "
+                             "needed, time and backward slice size")
+    parser.add_argument("--all-configs", action="store_true",
+                        help="analyze the graph with bounded ranges, unbounded_weight and unbounded_input in one run, "
+                             "sharing the parsed graph and the results which do not depend on the changed ranges, "
+                             "and report the verdicts side by side")
+    parser.add_argument("--ranges", default=None,
+                        help="a range-spec file (JSON, or TOML if it ends with .toml) giving the ranges of inputs and "
+                             "weights by node names, glob and regular expression patterns, and data types; see "
+                             "parse/range_spec.py")
+    parser.add_argument("--range-policy", default=None, choices=parse.range_spec.POLICIES,
+                        help="what to do with an input whose range is not specified: ask at the console (prompt), "
+                             "raise an error (fail), leave it unbounded (unbounded), or use the range-spec file's "
+                             "default range (default). Without this option, the file's policy is used, or prompt if "
+                             "it has none")
+    args = parser.parse_args()
+    if args.split_depth < 0:
+        parser.error("--split-depth must not be negative")
+    if args.split_ways < 2:
+        parser.error("--split-ways must be at least 2")
+    tracer.configure(args.trace, args.trace_file)
+    parse.parse_graph.use_tensorflow_shapes = args.tensorflow_shapes
+    checker.split_attempts = args.split_attempts
+    checker.split_time = args.split_time
+    checker.split_depth = args.split_depth
+    checker.split_ways = args.split_ways
+    checker.split_pairs = args.split_pairs
+    if args.all_configs and args.setting is not None:
+        parser.error("--all-configs analyzes every setting, so no setting can be given")
+    stream = None if args.stream is None else sys.stdout if args.stream == "-" else open(args.stream, "w")
+    options = dict(signature=args.signature, tags=None if args.tags is None else args.tags.split(","),
+                   cache_dir=None if args.no_cache else args.cache_dir or default_cache_dir(), jobs=args.jobs,
+                   deterministic=args.deterministic, stream=stream,
+                   range_spec=parse.range_spec.load(args.ranges, args.range_policy))
+    if args.all_configs:
+        result = run_all_configs(args.filename, **options)
+    else:
+        result = run(args.filename, args.setting, **options)
+    if stream is not None and stream is not sys.stdout:
+        stream.close()
+    tracer.close()
+    if args.all_configs:
+        for record in result["configs"]:
+            for line in record["analysis_warnings"]:
+                print(setting_name(record["setting"]) + ":", line)
+        for line in all_configs_report(result):
+            print(line)
+    else:
+        for line in result["analysis_warnings"]:
+            print(line)
+        print(result["network"], ", all: ", result["all"], "\twarnings: ", result["warnings"], "\tsafe: ",
+              result["safe"])
@@ -0,0 +1,49 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# the root of the repository, from which the modules are imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the entry points whose import cost is measured
+MODULES = ["analysis_main", "checker", "parse.parse_graph", "solver"]
+# the heavy dependencies which should only be imported when a feature needs them
+HEAVY = ["z3", "graphviz", "tensorflow"]
+
+
+# imports module in a fresh interpreter with -X importtime and returns {imported module: (self us, cumulative us)}.
+def import_times(module):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], cwd=ROOT,
+                            stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, universal_newlines=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+# measures the import time of every module in MODULES repeat times, and prints the median of the total import time,
+# the heavy dependencies imported, and the top modules by their own import time in the last run.
+def main():
+    parser = argparse.ArgumentParser(description="measure the startup cost of importing the entry points of DEBAR")
+    parser.add_argument("--repeat", type=int, default=5, help="the number of fresh interpreters per module")
+    parser.add_argument("--top", type=int, default=5, help="the number of most expensive modules listed")
+    args = parser.parse_args()
+
+    for module in MODULES:
+        totals = []
+        times = {}
+        for _ in range(args.repeat):
+            times = import_times(module)
+            totals.append(times[module][1])
+        heavy = [name for name in HEAVY if name in times]
+        print("%-20s %8.1f ms  heavy: %s" % (module, statistics.median(totals) / 1000, ", ".join(heavy) or "none"))
+        for name in sorted(times, key=lambda x: -times[x][0])[:args.top]:
+            print("    %-40s %8.1f ms" % (name, times[name][0] / 1000))
+
+
+if __name__ == "__main__":
+    main()
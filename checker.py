@@ -0,0 +1,421 @@
+import itertools
+import math
+import multiprocessing
+import time
+
+import numpy as np
+
+import tracer
+from parse.slice_index import is_gradient
+from solver import Range, is_const, meet, meet_const
+from utils import OVERFLOW_LIMIT, UNDERFLOW_LIMIT
+
+# the unsafe operations checked by DEBAR
+rule = ["Log", "Exp", "RealDiv", "Sqrt", "Rsqrt", "Expm1", "Log1p", "Reciprocal"]
+
+# the budget of predicate splitting of every suspect: the maximum number of candidates tried and the maximum time in
+# seconds spent on them (None for unlimited). A suspect is reported as a warning if its budget runs out before a
+# candidate proves it safe.
+split_attempts = None
+split_time = None
+# the recursive predicate splitting: a span which is still not valid is split again into split_ways spans of equal
+# width, down to split_depth levels (0 only splits at 0). If split_pairs is True, the pairs of candidates are also split
+# together after every candidate fails alone.
+split_depth = 0
+split_ways = 2
+split_pairs = False
+
+
+# raised when the time budget of predicate splitting of a suspect runs out
+class SplitBudgetExhausted(Exception):
+    pass
+
+
+# returns the danger zone of the unsafe operation op and the position of its input checked against the danger zone.
+def danger_zone(op):
+    if op in ["Exp", "Expm1"]:
+        return Range(left=math.log(OVERFLOW_LIMIT), right=None, const_type=0), 0
+    elif op in ["RealDiv", "Floormod"]:
+        # we only care about the denominator
+        return Range(left=-UNDERFLOW_LIMIT, right=UNDERFLOW_LIMIT, const_type=0), 1
+    elif op == "Log":
+        return Range(left=None, right=UNDERFLOW_LIMIT, const_type=0), 0
+    elif op == "Sqrt":
+        return Range(left=None, right=-UNDERFLOW_LIMIT, const_type=0), 0
+    elif op == "Rsqrt":
+        return Range(left=None, right=UNDERFLOW_LIMIT, const_type=0), 0
+    elif op == "Log1p":
+        return Range(left=-UNDERFLOW_LIMIT - 1, right=UNDERFLOW_LIMIT - 1, const_type=0), 0
+    elif op == "Reciprocal":
+        return Range(left=-UNDERFLOW_LIMIT, right=UNDERFLOW_LIMIT, const_type=0), 0
+    else:
+        raise NotImplementedError("No rule for ", op)
+
+
+# returns the ids of the unsafe operations in the main clique of graph.
+def find_suspects(graph):
+    return [i for (i, node) in enumerate(graph.nodes) if node.op in rule and graph.f.find(i) == graph.main_clique]
+
+
+# returns the node where the backward slice of suspect starts: the denominator for RealDiv and Floormod, otherwise the
+# suspect itself.
+def slice_root(graph, suspect):
+    if graph.nodes[suspect].op in ["RealDiv", "Floormod"]:
+        return graph.plan[suspect].parents[1]
+    return suspect
+
+
+# checks whether the dataflow analysis of the backward slice of suspect is kept by graph: the nodes read by suspect
+# (the denominator for RealDiv and Floormod) are visited. Graph.invalidate forgets every visited node depending on a
+# forgotten node, so the whole slice is kept if they are.
+def is_analyzed(graph, suspect):
+    root = slice_root(graph, suspect)
+    return all(graph.node_visited[x] for x in ([root] if root != suspect else graph.plan[suspect].parents))
+
+
+# returns the key of the check of suspect: (the id of the input node checked against the danger zone, the edge index,
+# the danger zone). The suspects with the same key, e.g., several Log nodes reading the same tensor, or a RealDiv and
+# a Reciprocal of the same denominator, are checked once.
+def guard_key(graph, suspect):
+    zone, _ = danger_zone(graph.nodes[suspect].op)
+    return checked_input(graph, suspect) + (zone.left, zone.right)
+
+
+# runs the dataflow analysis of the backward slices of all suspects one by one, which is shared by their checks, and
+# yields (suspect, the result of forward_analysis) as soon as the suspect is analyzed (None if the suspect is not
+# interested). The backward slice of a suspect without its own node only depends on the checked input, so the result is
+# shared by the suspects with the same key (see guard_key) except for the gradients.
+def analyze_each(graph, suspects):
+    # the backward slices of all unsafe operations are indexed at once
+    graph.index_slices([slice_root(graph, suspect) for suspect in suspects])
+    shared = {}
+    for suspect in suspects:
+        key = guard_key(graph, suspect)
+        if key in shared:
+            if is_gradient(graph.node_names[suspect]):
+                tracer.trace(tracer.NODE, "skip", name=graph.node_names[suspect], reason="gradients are not interested")
+                yield suspect, None
+            else:
+                yield suspect, shared[key]
+            continue
+
+        if graph.nodes[suspect].op in ["RealDiv", "Floormod"]:
+            # special treatment for div because we only care about the denominator
+            ret = graph.forward_analysis(slice_root(graph, suspect), suspect)
+        else:
+            ret = graph.forward_analysis(suspect)
+        # a suspect skipped for its own name does not decide the others
+        if ret is not None or not is_gradient(graph.node_names[suspect]):
+            shared[key] = ret
+        yield suspect, ret
+
+
+# runs the dataflow analysis of the backward slices of all suspects (see analyze_each). Returns the result of
+# forward_analysis for every suspect.
+def analyze(graph, suspects):
+    return [ret for (_, ret) in analyze_each(graph, suspects)]
+
+
+# checks whether the input_range intersects with the danger zone
+# return true if dose no intersect; otherwise, return false
+# The constant intervals and the concrete values are decided directly on numbers, and z3 is only used when the input
+# range is symbolic.
+def is_valid(input_range, zone):
+    intersects = meet_const(input_range, zone)
+    if intersects is not None:
+        return not intersects
+
+    import z3
+    additional_constraint = meet(input_range, zone)
+    S = z3.Solver()
+    S.add(additional_constraint)
+    ans = S.check()
+    assert ans != z3.unknown
+    return ans == z3.unsat
+
+
+# returns the input of suspect checked against its danger zone: (the id of the input node, the edge index).
+def checked_input(graph, suspect):
+    _, position = danger_zone(graph.nodes[suspect].op)
+    return graph.plan[suspect].parents[position], graph.plan[suspect].edge_index[position]
+
+
+# checks whether the input of suspect is valid without predicate splitting.
+def check_without_split(graph, suspect):
+    zone, _ = danger_zone(graph.nodes[suspect].op)
+    backward_analysis_const_start, index = checked_input(graph, suspect)
+    return is_valid(graph.node_output[backward_analysis_const_start].index_of(index).value, zone)
+
+
+# returns a bound of an interval as a JSON value: a number, None if it is unbounded, or a string if it is symbolic.
+def json_bound(x):
+    if x is None:
+        return None
+    if is_const(x):
+        return float(x) if math.isfinite(x) else None
+    return str(x)
+
+
+# returns the details of the verdict of suspect reported by check_each, where ret is the result of forward_analysis,
+# split tells whether predicate splitting was needed and elapsed is the time spent on suspect in seconds: the input
+# interval checked against the danger zone, the danger zone, split, elapsed and the size of the backward slice.
+def verdict_details(graph, suspect, ret, split, elapsed):
+    zone, _ = danger_zone(graph.nodes[suspect].op)
+    backward_analysis_const_start, index = checked_input(graph, suspect)
+    value = graph.node_output[backward_analysis_const_start].index_of(index).value
+    if isinstance(value, Range):
+        interval = [json_bound(value.left), json_bound(value.right)]
+    else:  # the concrete values
+        values = np.asarray(value, dtype=float)
+        interval = [json_bound(values.min()), json_bound(values.max())] if values.size > 0 else [None, None]
+    return {"interval": interval, "danger_zone": [json_bound(zone.left), json_bound(zone.right)], "split": split,
+            "time": elapsed, "slice_size": len(ret[1])}
+
+
+# returns the candidates of predicate splitting of suspect, where ret is the result of forward_analysis: a list of
+# (name, the ids of the changed nodes, spans), where the range of name is split into spans at 0. The candidates whose
+# forward cone does not reach the checked input cannot change its range and are dropped; the others are ranked by the
+# size of their forward cone, so that the cheap reevaluations are tried first (ties are broken by name to keep the
+# order reproducible).
+def split_candidates(graph, suspect, ret):
+    range_to_split, nodes_interested = ret
+    backward_analysis_const_start, _ = checked_input(graph, suspect)
+    candidates = []
+    for name in sorted(range_to_split):
+        # if the name has |, we have to remove it to get the name in the graph
+        if name.find('|') != -1:
+            changed = {graph.node_ids[name[:name.find('|')]]}
+        else:
+            changed = {graph.node_ids[name]}
+        value = graph.get_value(name)
+        if value.left < 0 and value.right > 0:
+            cone = graph.forward_cone(nodes_interested, backward_analysis_const_start, changed)
+            if backward_analysis_const_start in cone:
+                candidates.append((len(cone), name, changed,
+                                   [Range(left=value.left, right=0), Range(left=0, right=value.right)]))
+    candidates.sort(key=lambda x: x[0])
+    return [candidate[1:] for candidate in candidates]
+
+
+# checks whether the input of suspect is valid when the ranges of some candidates are overridden, where
+# nodes_interested is the backward slice returned by forward_analysis and box is a tuple of (name, the ids of the
+# changed nodes, span) of the overridden candidates.
+def check_box(graph, suspect, nodes_interested, box):
+    zone, _ = danger_zone(graph.nodes[suspect].op)
+    backward_analysis_const_start, index = checked_input(graph, suspect)
+    override_dict = {name: span for (name, _, span) in box}
+    changed = set()
+    for (_, seeds, _) in box:
+        changed.update(seeds)
+    # incrementally rerun the dataflow analysis on changed node set with the node output overridden to override_dict
+    node_out = graph.reevaluate(nodes_interested, backward_analysis_const_start, changed, override_dict)
+    return is_valid(node_out.index_of(index).value, zone)
+
+
+# splits span into ways spans of equal width. Returns an empty list if span is unbounded.
+def split_range(span, ways):
+    if not (math.isfinite(span.left) and math.isfinite(span.right)):
+        return []
+    points = [span.left + (span.right - span.left) * i / ways for i in range(ways)] + [span.right]
+    return [Range(left=points[i], right=points[i + 1]) for i in range(ways)]
+
+
+# returns the boxes covering box, where the widest span is split into split_ways spans.
+def refine(box):
+    i = max(range(len(box)), key=lambda j: box[j][2].right - box[j][2].left)
+    name, changed, span = box[i]
+    return [box[:i] + ((name, changed, sub),) + box[i + 1:] for sub in split_range(span, split_ways)]
+
+
+def box_key(box):
+    return tuple((name, span.left, span.right) for (name, _, span) in box)
+
+
+# checks whether the input of suspect is valid in box (see check_box). A box which is not valid is refined (see refine)
+# recursively at most depth times, and it is valid if all the refined boxes are valid. memo maps the boxes already
+# checked to the results and the depths they were checked with, so that the overlapping subdivisions are not checked
+# again. Raises SplitBudgetExhausted if the time passes deadline.
+def prove(graph, suspect, nodes_interested, box, depth, memo, deadline):
+    key = box_key(box)
+    if key in memo:
+        if memo[key][0] or memo[key][1] >= depth:
+            return memo[key][0]
+        valid = False  # only the refined boxes are checked again with the larger depth
+    else:
+        if deadline is not None and time.monotonic() > deadline:
+            raise SplitBudgetExhausted()
+        valid = check_box(graph, suspect, nodes_interested, box)
+    if not valid and depth > 0:
+        boxes = refine(box)
+        valid = len(boxes) > 0 and all(
+            prove(graph, suspect, nodes_interested, sub, depth - 1, memo, deadline) for sub in boxes)
+    memo[key] = (valid, depth)
+    return valid
+
+
+# returns the units of predicate splitting of suspect within the budget of split_attempts, and whether any candidate
+# is left out. A unit is a list of boxes (see check_box) splitting a candidate (or a pair of candidates if split_pairs
+# is True) at 0, and the suspect is safe if all the boxes of any unit are valid.
+def split_units(graph, suspect, ret):
+    candidates = split_candidates(graph, suspect, ret)
+    exhausted = False
+    if split_attempts is not None and len(candidates) > split_attempts:
+        candidates, exhausted = candidates[:split_attempts], True
+    units = [[((name, changed, span),) for span in spans] for (name, changed, spans) in candidates]
+    if split_pairs:
+        for ((name1, changed1, spans1), (name2, changed2, spans2)) in itertools.combinations(candidates, 2):
+            units.append([((name1, changed1, span1), (name2, changed2, span2))
+                          for span1 in spans1 for span2 in spans2])
+    return units, exhausted
+
+
+def warn_budget(graph, suspect):
+    tracer.warn("the exhausted budget of predicate splitting", graph.node_names[suspect])
+
+
+# checks whether the input of suspect is valid with predicate splitting: the suspect is safe if all the boxes of any
+# unit are valid.
+def check_split(graph, suspect, ret):
+    units, exhausted = split_units(graph, suspect, ret)
+    deadline = None if split_time is None else time.monotonic() + split_time
+    memo = {}
+    try:
+        for boxes in units:
+            if all(prove(graph, suspect, ret[1], box, split_depth, memo, deadline) for box in boxes):
+                return True
+    except SplitBudgetExhausted:
+        exhausted = True
+
+    if exhausted:
+        warn_budget(graph, suspect)
+    return False
+
+
+# the graph, the tasks, the cancellation marks and the time when the first task of every suspect started in the worker
+# processes, which are inherited from the parent process by fork. Every worker process memoizes the boxes of every
+# suspect in its own copy of _worker_memo.
+_worker_graph = None
+_worker_tasks = None
+_worker_cancel = None
+_worker_started = None
+_worker_memo = None
+
+
+# returns (t, whether the box is valid or None if the task is skipped, whether the time budget has run out, warnings).
+def _box_task(t):
+    pos, k, suspect, nodes_interested, box = _worker_tasks[t]
+    if _worker_cancel[pos] < k:  # cancelled because a unit before k (or any unit) has proved the safety
+        return t, None, False, {}
+    deadline = None
+    if split_time is not None:
+        if _worker_started[pos] == 0:
+            _worker_started[pos] = time.monotonic()
+        deadline = _worker_started[pos] + split_time
+    try:
+        valid = prove(_worker_graph, suspect, nodes_interested, box, split_depth, _worker_memo.setdefault(pos, {}),
+                      deadline)
+    except SplitBudgetExhausted:
+        return t, None, True, tracer.take_warnings()
+    return t, valid, False, tracer.take_warnings()
+
+
+# checks the suspects one by one and yields (suspect, verdict, details) as soon as the verdict of a suspect is known,
+# where verdict is True if the suspect is safe and details are given by verdict_details. The suspects ignored by
+# forward_analysis are skipped, and the suspects with the same key (see guard_key) are checked once. If jobs <= 1, every
+# suspect is checked right after its own dataflow analysis, in the order of suspects; otherwise the dataflow analysis of
+# all suspects comes first, and the verdicts are yielded in the order they are found by the worker processes (see
+# check_unique_each). The time of a suspect is the time of its dataflow analysis and of its check.
+def check_each(graph, suspects, jobs=1, deterministic=False):
+    if jobs <= 1:
+        verdicts = {}
+        start = time.monotonic()
+        for (suspect, ret) in analyze_each(graph, suspects):
+            if ret is not None:
+                key = guard_key(graph, suspect)
+                if key not in verdicts:
+                    split = not check_without_split(graph, suspect)
+                    verdicts[key] = (not split or check_split(graph, suspect, ret), split)
+                yield suspect, verdicts[key][0], verdict_details(graph, suspect, ret, verdicts[key][1],
+                                                                 time.monotonic() - start)
+            start = time.monotonic()
+        return
+
+    groups = {}  # maps a key to the list of (suspect, ret, the time of the dataflow analysis) of the suspects
+    start = time.monotonic()
+    for (suspect, ret) in analyze_each(graph, suspects):
+        if ret is not None:
+            groups.setdefault(guard_key(graph, suspect), []).append((suspect, ret, time.monotonic() - start))
+        start = time.monotonic()
+    groups = list(groups.values())
+    for (pos, verdict, split) in check_unique_each(graph, [group[0][:2] for group in groups], jobs, deterministic):
+        for (suspect, ret, elapsed) in groups[pos]:
+            yield suspect, verdict, verdict_details(graph, suspect, ret, split, elapsed + time.monotonic() - start)
+
+
+# checks checked, a list of (suspect, the result of forward_analysis), and yields (the position of the suspect in
+# checked, verdict, whether predicate splitting was needed) as soon as the verdict of a suspect is known.
+# If jobs > 1, the boxes of the units (see split_units) of all suspects are evaluated by jobs worker processes forked
+# after the shared dataflow analysis, so that the workers inherit graph and its abstracted outputs without copying.
+# Once a unit proves a suspect safe, the boxes of the suspect not started yet are cancelled. If deterministic is True,
+# only the units after the first successful unit in order are cancelled, so that the same units as the sequential
+# check are evaluated and the results do not depend on the scheduling. The time budget of a suspect starts when its
+# first task starts.
+def check_unique_each(graph, checked, jobs, deterministic):
+    global _worker_graph, _worker_tasks, _worker_cancel, _worker_started, _worker_memo
+    if jobs <= 1:
+        for (pos, (suspect, ret)) in enumerate(checked):
+            split = not check_without_split(graph, suspect)
+            yield pos, not split or check_split(graph, suspect, ret), split
+        return
+
+    verdicts = []
+    exhausted = []
+    tasks = []
+    num_boxes = {}
+    num_tasks = []  # the number of tasks of every suspect not finished yet
+    for (pos, (suspect, ret)) in enumerate(checked):
+        verdicts.append(check_without_split(graph, suspect))
+        exhausted.append(False)
+        num_tasks.append(0)
+        if verdicts[-1]:
+            yield pos, True, False
+            continue
+        units, exhausted[pos] = split_units(graph, suspect, ret)
+        for (k, boxes) in enumerate(units):
+            num_boxes[(pos, k)] = len(boxes)
+            num_tasks[pos] += len(boxes)
+            for box in boxes:
+                tasks.append((pos, k, suspect, ret[1], box))
+        if num_tasks[pos] == 0:
+            yield pos, False, True
+
+    context = multiprocessing.get_context("fork")
+    _worker_graph, _worker_tasks, _worker_memo = graph, tasks, {}
+    # the units of the suspect at pos after _worker_cancel[pos] are cancelled, and initially none is cancelled
+    _worker_cancel = context.RawArray("l", [len(tasks)] * len(checked))
+    _worker_started = context.RawArray("d", len(checked))
+    results = [None] * len(tasks)
+    try:
+        with context.Pool(jobs) as pool:
+            for (t, valid, out_of_time, warnings) in pool.imap_unordered(_box_task, range(len(tasks)), chunksize=1):
+                results[t] = warnings
+                pos, k = tasks[t][:2]
+                exhausted[pos] = exhausted[pos] or out_of_time
+                num_tasks[pos] -= 1
+                if valid:
+                    num_boxes[(pos, k)] -= 1
+                    if num_boxes[(pos, k)] == 0:  # all the boxes of unit k are valid
+                        _worker_cancel[pos] = min(_worker_cancel[pos], k) if deterministic else -1
+                        if not verdicts[pos]:
+                            verdicts[pos] = True
+                            yield pos, True, True
+                if num_tasks[pos] == 0 and not verdicts[pos]:  # no unit is valid
+                    yield pos, False, True
+    finally:
+        _worker_graph, _worker_tasks, _worker_cancel, _worker_started, _worker_memo = None, None, None, None, None
+
+    for warnings in results:  # merged in the order of the tasks
+        tracer.merge_warnings(warnings)
+    for (pos, (suspect, _)) in enumerate(checked):
+        if exhausted[pos] and not verdicts[pos]:
+            warn_budget(graph, suspect)
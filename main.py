@@ -1,56 +1,284 @@
-# call the analysis_main.py
-import sys
+# runs analysis_main.py on every model of the datasets in a pool of worker processes
+import argparse
+import json
 import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
 import time
+import traceback
 
+# the analysis is imported once in the driver, and every worker process is forked from the driver, so that the workers
+# start with all modules imported and with a clean global state
+import analysis_main
+from parse.graph_cache import default_cache_dir
+import parse.range_spec
 from parse.specified_ranges import SpecifiedRanges
+from work_queue import WorkQueue
+
+# how often the running workers are checked against the limits, in seconds
+POLL_INTERVAL = 0.1
+
+
+# returns the resident set size of process pid in bytes, or None if it is not available (e.g., not on Linux).
+def rss_of(pid):
+    try:
+        with open("/proc/%d/statm" % pid) as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# runs in the forked worker process: analyzes the model and writes its record to record_file. The output of the
+# analysis goes to log_file (discarded if None), and the standard input is closed, so that a model without specified
+# ranges fails instead of waiting for the ranges (see analysis_main.run for range_spec). All the settings are analyzed
+# by analysis_main.run_all_configs if setting is analysis_main.ALL_CONFIGS.
+def run_worker(filename, setting, cache_dir, log_file, record_file, range_spec):
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    log = devnull if log_file is None else os.open(log_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    os.dup2(log, 1)
+    os.dup2(log, 2)
+    try:
+        if setting == analysis_main.ALL_CONFIGS:
+            record = analysis_main.run_all_configs(filename, cache_dir=cache_dir, range_spec=range_spec)
+        else:
+            record = analysis_main.run(filename, setting, cache_dir=cache_dir, range_spec=range_spec)
+        record["status"] = "ok"
+    except BaseException as e:
+        traceback.print_exc()
+        record = {"status": "error", "error": "%s: %s" % (type(e).__name__, e)}
+    sys.stdout.flush()
+    sys.stderr.flush()
+    with open(record_file, "w") as f:
+        json.dump(record, f)
+
+
+# a model being analyzed by a worker process, where key identifies the model for the caller of run_models
+class Job:
+    def __init__(self, key, model, setting, pid, record_file):
+        self.key = key
+        self.model = model
+        self.setting = setting
+        self.pid = pid
+        self.record_file = record_file
+        self.start = time.time()
+        self.peak_rss = 0
+        self.status = None  # set if the worker is killed
+
+
+# runs the models returned by next_model, which returns (key, model, setting) or None if there is no model to run for
+# now, and calls on_record(key, record) when a model finishes. on_poll(keys) is called with the keys of the running
+# models every POLL_INTERVAL seconds. At most jobs models are analyzed at the same time. A worker is killed if its model
+# runs longer than timeout seconds or its resident set size exceeds max_rss bytes (None for unlimited). Returns when
+# next_model returns None and every started model has finished. cache_dir and range_spec are passed to
+# analysis_main.run.
+def run_models(next_model, on_record, path, jobs, timeout=None, max_rss=None, cache_dir=None, log_dir=None,
+               range_spec=None, on_poll=None):
+    tmp_dir = tempfile.mkdtemp(prefix="debar-")
+    running = {}
+    started = 0
+    exhausted = False
+    try:
+        while not exhausted or len(running) > 0:
+            while not exhausted and len(running) < jobs:
+                item = next_model()
+                if item is None:
+                    exhausted = True
+                    break
+                key, model, setting = item
+                record_file = os.path.join(tmp_dir, "%d.json" % started)
+                started += 1
+                log_file = None if log_dir is None else os.path.join(log_dir, model + ".log")
+                sys.stdout.flush()  # otherwise the worker would write the buffered output of the driver again
+                pid = os.fork()
+                if pid == 0:
+                    try:
+                        run_worker(os.path.join(path, model + ".pbtxt"), setting, cache_dir, log_file, record_file,
+                                   range_spec)
+                    finally:
+                        os._exit(0)
+                running[pid] = Job(key, model, setting, pid, record_file)
+                print("Running %s" % model)
+
+            time.sleep(POLL_INTERVAL)
+            if on_poll is not None:
+                on_poll([job.key for job in running.values()])
+            for job in list(running.values()):
+                pid, exit_status, usage = os.wait4(job.pid, os.WNOHANG)
+                if pid == 0:
+                    rss = rss_of(job.pid)
+                    job.peak_rss = max(job.peak_rss, rss or 0)
+                    if timeout is not None and time.time() - job.start > timeout:
+                        job.status = "timeout"
+                    elif max_rss is not None and rss is not None and rss > max_rss:
+                        job.status = "memory"
+                    else:
+                        continue
+                    os.kill(job.pid, signal.SIGKILL)
+                    pid, exit_status, usage = os.wait4(job.pid, 0)
+
+                del running[job.pid]
+                record = {"model": job.model, "setting": job.setting}
+                if job.status is None and os.path.exists(job.record_file):
+                    with open(job.record_file) as f:
+                        record.update(json.load(f))
+                else:
+                    record["status"] = job.status or "crashed"
+                # a worker may be killed after writing its record
+                if os.path.exists(job.record_file):
+                    os.remove(job.record_file)
+                record["time"] = time.time() - job.start
+                # ru_maxrss is in kilobytes on Linux
+                record["peak_rss_mb"] = max(job.peak_rss, usage.ru_maxrss * 1024) / (1 << 20)
+                on_record(job.key, record)
+    finally:
+        # a killed worker may leave its record behind, and on_record may raise
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# runs the models and appends a JSON record per model to results_file as soon as the model finishes (see run_models
+# for the other arguments).
+def run_local(models, results_file, path, setting, jobs, **limits):
+    pending = list(models)
+    with open(results_file, "a") as results:
+        def on_record(_, record):
+            results.write(json.dumps(record) + "\n")
+            results.flush()
 
-path = "/tmp"
-try:
-    assert len(sys.argv) == 2
-    path = sys.argv[1]
-
-except:
-    print(
-        "Please run 'python main.py PATH_TO_DATASETS'.\nAborted...")
-    exit(1)
-
-unbounded_weight = False
-unbounded_input = False
-interpreter_path = sys.executable
-print("Running at: ", interpreter_path)
-result_filename = "results.txt"
-
-open(result_filename, 'w').close()
-
-times = {}
-for model in SpecifiedRanges.models:
-    t0 = time.time()
-    print("Running %s" % model)
-    if not unbounded_weight and not unbounded_input:
-        os.system(
-            "(%s ./analysis_main.py %s/%s.pbtxt) >> %s 2>&1" % (interpreter_path, path, model, result_filename))
-    elif unbounded_weight:
-        os.system("(%s ./analysis_main.py %s/%s.pbtxt unbounded_weight) >> %s 2>&1" % (
-            interpreter_path, path, model, result_filename))
-    elif unbounded_input:
-        os.system("(%s ./analysis_main.py %s/%s.pbtxt unbounded_input) >> %s 2>&1" % (
-            interpreter_path, path, model, result_filename))
-    times[model] = time.time() - t0
-
-lines = open(result_filename).readlines()
-f = open(result_filename, 'a')
-info = {}
-for line in lines:
-    if line.find("warnings") != -1 and len(line) > 10:
-        splits = line.split()
-        model_name = splits[0]
-        info[model_name] = line.strip()
-
-for model in SpecifiedRanges.models:
-    if model in info:
-        print(info[model] + "\t in time: %.2f" % times[model])
-        f.write(info[model] + "\t in time: %.2f" % times[model] + "\n")
+        run_models(lambda: (None, pending.pop(0), setting) if len(pending) > 0 else None, on_record, path, jobs,
+                   **limits)
+
+
+# runs the jobs claimed from queue until every job of the queue is done, which may be shared by workers on other
+# machines (see work_queue.py). The records are stored in the queue, and a job whose worker stops sending heartbeats is
+# run again. Every job is run in the setting it was enqueued with.
+def run_queue(queue, path, jobs, **limits):
+    worker = "%s:%d" % (socket.gethostname(), os.getpid())
+    last_heartbeat = [time.time()]
+
+    def next_model():
+        queue.reclaim_stale()
+        claimed = queue.claim()
+        if claimed is None:
+            return None
+        return claimed[0], claimed[1]["model"], claimed[1]["setting"]
+
+    def on_record(name, record):
+        record["worker"] = worker
+        queue.finish(name, record)
+
+    def on_poll(names):
+        if time.time() - last_heartbeat[0] > queue.stale / 4:
+            for name in names:
+                queue.heartbeat(name)
+            last_heartbeat[0] = time.time()
+
+    while not queue.is_complete():
+        run_models(next_model, on_record, path, jobs, on_poll=on_poll, **limits)
+        # the remaining jobs are claimed by other workers, which are waited for in case they crash
+        time.sleep(min(queue.stale / 4, 5))
+
+
+# reads the records in results_file. Returns a map from (model, setting) to the last record.
+def read_results(results_file):
+    records = {}
+    if os.path.exists(results_file):
+        with open(results_file) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # the last line may be truncated by an interrupted run
+                    continue
+                records[(record["model"], record["setting"])] = record
+    return records
+
+
+# returns the line of the summary of a record, with a line per setting for the records of all settings.
+def summary_line(record):
+    if record["status"] != "ok":
+        return "Runtime error when running %s (%s)." % (record["model"], record.get("error", record["status"]))
+    if "configs" in record:
+        return "\n".join("%s , %s , all:  %d \twarnings:  %d \tsafe:  %d" % (
+            record["network"], analysis_main.setting_name(x["setting"]), x["all"], x["warnings"], x["safe"])
+                         for x in record["configs"]) + "\t in time: %.2f" % record["time"]
+    return "%s , all:  %d \twarnings:  %d \tsafe:  %d\t in time: %.2f" % (
+        record["network"], record["all"], record["warnings"], record["safe"], record["time"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="run DEBAR on the models of the datasets")
+    parser.add_argument("path", help="the directory of the datasets, containing MODEL.pbtxt for every model")
+    parser.add_argument("setting", nargs="?", choices=["unbounded_weight", "unbounded_input"],
+                        help="leave the weights or the inputs unbounded")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(),
+                        help="the number of models analyzed at the same time (default: the number of CPUs)")
+    parser.add_argument("--timeout", type=float, default=None, help="the time limit of every model in seconds")
+    parser.add_argument("--max-rss", type=float, default=None,
+                        help="the limit of the resident set size of every model in MB")
+    parser.add_argument("--results", default="results.jsonl",
+                        help="the file of the JSON records of the models (default: results.jsonl)")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip the models which already have records in the results file")
+    parser.add_argument("--log-dir", default=None, help="write the output of every model to LOG_DIR/MODEL.log")
+    parser.add_argument("--cache-dir", default=None,
+                        help="the directory of cached graphs (default: $DEBAR_CACHE_DIR or ~/.cache/debar)")
+    parser.add_argument("--no-cache", action="store_true", help="always parse and build the graphs from scratch")
+    parser.add_argument("--models", default=None,
+                        help="comma separated models to run instead of all models in SpecifiedRanges.models")
+    parser.add_argument("--queue", default=None,
+                        help="run the jobs of the work queue in this directory, which can be shared by workers on "
+                             "several machines")
+    parser.add_argument("--enqueue", action="store_true", help="with --queue, add the models to the queue and exit")
+    parser.add_argument("--merge", action="store_true",
+                        help="with --queue, write the records of the finished jobs to the results file and exit")
+    parser.add_argument("--stale", type=float, default=60,
+                        help="with --queue, run a job again if its worker sends no heartbeat for this number of "
+                             "seconds (default: 60)")
+    parser.add_argument("--all-configs", action="store_true",
+                        help="analyze every model with bounded ranges, unbounded_weight and unbounded_input in one "
+                             "worker, sharing the results which do not depend on the changed ranges")
+    parser.add_argument("--ranges", default=None,
+                        help="a range-spec file giving the ranges of inputs and weights (see parse/range_spec.py)")
+    parser.add_argument("--range-policy", default=None, choices=parse.range_spec.POLICIES,
+                        help="what to do with an input whose range is not specified (default: the policy of the "
+                             "range-spec file, or prompt, which fails in the workers)")
+    args = parser.parse_args()
+
+    if args.all_configs and args.setting is not None:
+        parser.error("--all-configs analyzes every setting, so no setting can be given")
+    if args.all_configs:
+        args.setting = analysis_main.ALL_CONFIGS
+    models = SpecifiedRanges.models if args.models is None else args.models.split(",")
+    limits = {"timeout": args.timeout, "max_rss": None if args.max_rss is None else args.max_rss * (1 << 20),
+              "cache_dir": None if args.no_cache else args.cache_dir or default_cache_dir(), "log_dir": args.log_dir,
+              "range_spec": parse.range_spec.load(args.ranges, args.range_policy)}
+    if args.log_dir is not None:
+        os.makedirs(args.log_dir, exist_ok=True)
+
+    if args.queue is not None:
+        queue = WorkQueue(args.queue, args.stale)
+        if args.enqueue:
+            print("%d jobs enqueued" % queue.enqueue(models, args.setting))
+            exit(0)
+        if not args.merge:
+            run_queue(queue, args.path, max(args.jobs, 1), **limits)
+            exit(0)
+        with open(args.results, "w") as results:
+            for record in queue.records():
+                results.write(json.dumps(record) + "\n")
     else:
-        print("Runtime error when running %s." % model)
-        f.write("Runtime error when running %s." % model + "\n")
+        if args.resume:
+            finished = read_results(args.results)
+            pending = [model for model in models if (model, args.setting) not in finished]
+        else:
+            open(args.results, "w").close()
+            pending = models
+        run_local(pending, args.results, args.path, args.setting, max(args.jobs, 1), **limits)
+
+    records = read_results(args.results)
+    for model in models:
+        if (model, args.setting) in records:
+            print(summary_line(records[(model, args.setting)]))
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import pickle
+
+from parse.graph_loader import graph_pb2, is_saved_model, SAVED_MODEL_FILENAMES
+from utils import VERSION
+
+# the fields of Graph computed by Graph.build, which are stored in the cache file. The ids of nodes are assigned again
+# by Graph.index_nodes when the cache file is loaded.
+build_products = ["backward", "forward", "f", "unique_clique", "main_clique", "topological_order", "scc_ids",
+                  "node_output"]
+
+
+# the default directory of cache files, which can be changed by the environment variable DEBAR_CACHE_DIR.
+def default_cache_dir():
+    return os.environ.get("DEBAR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "debar"))
+
+
+def file_hash(filename, chunk_size=1 << 20):
+    if is_saved_model(filename) and os.path.isdir(filename):
+        for name in SAVED_MODEL_FILENAMES:
+            if os.path.exists(os.path.join(filename, name)):
+                filename = os.path.join(filename, name)
+                break
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# the key of the cache file: the hash of the graph file, the version of DEBAR, and every option changing the built
+# graph.
+def cache_key(filename, *options):
+    h = hashlib.sha256()
+    h.update(file_hash(filename).encode())
+    h.update(VERSION.encode())
+    h.update(repr(options).encode())
+    return h.hexdigest()
+
+
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key + ".pkl")
+
+
+# restores the GraphDef and the build products of graph from the cache file. Returns False if there is no usable cache
+# file.
+def load(cache_dir, key, graph):
+    path = cache_path(cache_dir, key)
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(path, "rb") as f:
+            cached = pickle.load(f)
+        if cached["version"] != VERSION:
+            return False
+        graph.graph_def = graph_pb2.GraphDef.FromString(cached["graph_def"])
+        for field in build_products:
+            setattr(graph, field, cached[field])
+    except Exception:  # a corrupted or incompatible cache file is treated as a cache miss
+        return False
+    graph.index_nodes()
+    return True
+
+
+# stores the GraphDef and the build products of graph into the cache file. The file is written to a temporary file
+# first and then renamed, so that concurrent runs never read a partially written cache file.
+def save(cache_dir, key, graph):
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = {"version": VERSION, "graph_def": graph.graph_def.SerializeToString()}
+    for field in build_products:
+        cached[field] = getattr(graph, field)
+    path = cache_path(cache_dir, key)
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
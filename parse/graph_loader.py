@@ -0,0 +1,215 @@
+'''https://github.com/tensorflow/tensorflow/blob/master/tensorflow/core/protobuf/meta_graph.proto
+https://github.com/tensorflow/tensorflow/blob/master/tensorflow/core/protobuf/saved_model.proto'''
+
+import os
+
+try:
+    # the protocol buffers shipped with tensorboard are preferred, because importing the ones of TensorFlow imports the
+    # whole TensorFlow
+    from tensorboard.compat.proto import graph_pb2, meta_graph_pb2
+except ImportError:
+    from tensorflow.core.framework import graph_pb2
+    from tensorflow.core.protobuf import meta_graph_pb2
+
+# the tag used by tf.saved_model when exporting a model for serving
+SERVING_TAG = "serve"
+SAVED_MODEL_FILENAMES = ["saved_model.pb", "saved_model.pbtxt"]
+
+
+# parses a GraphDef stored in the text format (.pbtxt).
+def load_pbtxt(filename):
+    from google.protobuf import text_format
+    with open(filename) as f:
+        return text_format.Parse(f.read(), graph_pb2.GraphDef())
+
+
+# parses a GraphDef stored in the binary format (.pb).
+def load_pb(filename):
+    graph_def = graph_pb2.GraphDef()
+    with open(filename, "rb") as f:
+        graph_def.ParseFromString(f.read())
+    return graph_def
+
+
+# parses a MetaGraphDef (.meta, or .meta.pbtxt in the text format) and returns the GraphDef inside it. If signature is
+# not None, only the subgraph computing the outputs of that signature is returned.
+def load_meta_graph(filename, signature=None):
+    meta_graph_def = meta_graph_pb2.MetaGraphDef()
+    if filename.endswith(".pbtxt"):
+        from google.protobuf import text_format
+        with open(filename) as f:
+            text_format.Parse(f.read(), meta_graph_def)
+    else:
+        with open(filename, "rb") as f:
+            meta_graph_def.ParseFromString(f.read())
+    return graph_def_of_meta_graph(meta_graph_def, signature)
+
+
+# parses a SavedModel (the export directory or the saved_model.pb(txt) inside it) and returns the GraphDef of the
+# MetaGraphDef matching tags. If signature is not None, only the subgraph computing the outputs of that signature is
+# returned.
+def load_saved_model(path, tags=None, signature=None):
+    if os.path.isdir(path):
+        for name in SAVED_MODEL_FILENAMES:
+            if os.path.exists(os.path.join(path, name)):
+                path = os.path.join(path, name)
+                break
+        else:
+            raise IOError("no %s found in %s" % (" or ".join(SAVED_MODEL_FILENAMES), path))
+
+    if path.endswith(".pbtxt"):
+        # saved_model_pb2 is not shipped with tensorboard, so only the text format needs TensorFlow
+        try:
+            from tensorflow.core.protobuf import saved_model_pb2
+        except ImportError:
+            raise ImportError("loading a SavedModel in the text format requires TensorFlow")
+        from google.protobuf import text_format
+        saved_model = saved_model_pb2.SavedModel()
+        with open(path) as f:
+            text_format.Parse(f.read(), saved_model)
+        meta_graphs = [meta_graph_pb2.MetaGraphDef.FromString(meta_graph_def.SerializeToString()) for meta_graph_def
+                       in saved_model.meta_graphs]
+    else:
+        with open(path, "rb") as f:
+            meta_graphs = parse_saved_model_meta_graphs(f.read())
+
+    return graph_def_of_meta_graph(choose_meta_graph(meta_graphs, tags), signature)
+
+
+def _read_varint(data, pos):
+    ret = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        ret |= (b & 0x7f) << shift
+        shift += 7
+        if b < 0x80:
+            return ret, pos
+
+
+# decodes the meta_graphs field (field number 2) of a binary SavedModel message without saved_model_pb2, which is not
+# shipped with tensorboard and is only available by importing TensorFlow.
+def parse_saved_model_meta_graphs(data):
+    meta_graphs = []
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:  # varint
+            _, pos = _read_varint(data, pos)
+        elif wire_type == 1:  # 64-bit
+            pos += 8
+        elif wire_type == 5:  # 32-bit
+            pos += 4
+        elif wire_type == 2:  # length-delimited
+            length, pos = _read_varint(data, pos)
+            if field == 2:
+                meta_graph_def = meta_graph_pb2.MetaGraphDef()
+                meta_graph_def.ParseFromString(data[pos:pos + length])
+                meta_graphs.append(meta_graph_def)
+            pos += length
+        else:
+            raise ValueError("cannot decode the SavedModel (wire type %d)" % wire_type)
+    return meta_graphs
+
+
+# chooses the MetaGraphDef whose tag set equals tags. If tags is None, the only MetaGraphDef, or else the one tagged
+# for serving, or else the first one is chosen.
+def choose_meta_graph(meta_graphs, tags=None):
+    if len(meta_graphs) == 0:
+        raise ValueError("the SavedModel contains no MetaGraphDef")
+    if tags is not None:
+        for meta_graph_def in meta_graphs:
+            if set(meta_graph_def.meta_info_def.tags) == set(tags):
+                return meta_graph_def
+        raise ValueError("no MetaGraphDef with tags %s, available: %s" % (
+            sorted(tags), [sorted(meta_graph_def.meta_info_def.tags) for meta_graph_def in meta_graphs]))
+    for meta_graph_def in meta_graphs:
+        if SERVING_TAG in meta_graph_def.meta_info_def.tags:
+            return meta_graph_def
+    return meta_graphs[0]
+
+
+# returns the GraphDef of meta_graph_def, pruned to the outputs of signature if signature is not None.
+def graph_def_of_meta_graph(meta_graph_def, signature=None):
+    if signature is None:
+        return meta_graph_def.graph_def
+    if signature not in meta_graph_def.signature_def:
+        raise ValueError("no signature named %s, available: %s" % (
+            signature, sorted(meta_graph_def.signature_def.keys())))
+    outputs = [tensor_info.name for tensor_info in meta_graph_def.signature_def[signature].outputs.values()]
+    return extract_sub_graph(meta_graph_def.graph_def, [op_name(name) for name in outputs])
+
+
+# gets the operation name from a tensor name ("x:0") or from an input name ("^x", "x:1").
+def op_name(name):
+    if name[0] == '^':
+        name = name[1:]
+    pos = name.rfind(':')
+    if pos != -1 and name[pos + 1:].isdigit():
+        name = name[:pos]
+    return name
+
+
+# returns a new GraphDef only containing the nodes that dest_nodes depend on (including dest_nodes). The order of the
+# nodes is preserved.
+def extract_sub_graph(graph_def, dest_nodes):
+    node_by_name = {node.name: node for node in graph_def.node}
+    kept = set()
+    stack = []
+    for name in dest_nodes:
+        if name not in node_by_name:
+            raise ValueError("%s is not in the graph" % name)
+        if name not in kept:
+            kept.add(name)
+            stack.append(name)
+    while len(stack) > 0:
+        for in_node_raw in node_by_name[stack.pop()].input:
+            in_node = op_name(in_node_raw)
+            if in_node not in kept and in_node in node_by_name:
+                kept.add(in_node)
+                stack.append(in_node)
+
+    ret = type(graph_def)()
+    ret.versions.CopyFrom(graph_def.versions)
+    ret.library.CopyFrom(graph_def.library)
+    ret.node.extend([node for node in graph_def.node if node.name in kept])
+    return ret
+
+
+# checks whether filename is a SavedModel, i.e., the export directory or the saved_model.pb(txt) inside it.
+def is_saved_model(filename):
+    if os.path.isdir(filename):
+        return True
+    return os.path.basename(filename) in SAVED_MODEL_FILENAMES
+
+
+# chooses the loader according to the file type of filename and returns the parsed GraphDef.
+# tags and signature are only used by MetaGraphDef and SavedModel.
+def load_graph_def(filename, signature=None, tags=None):
+    if is_saved_model(filename):
+        return load_saved_model(filename, tags, signature)
+    if filename.endswith(".meta") or filename.endswith(".meta.pbtxt"):
+        return load_meta_graph(filename, signature)
+    if signature is not None:
+        raise ValueError("a signature can only be chosen for MetaGraphDef and SavedModel files")
+    if filename.endswith(".pbtxt"):
+        return load_pbtxt(filename)
+    if filename.endswith(".pb"):
+        return load_pb(filename)
+    raise ValueError("cannot recognize the file type of %s (expected .pbtxt, .pb, .meta or a SavedModel)" % filename)
+
+
+# gets the name of the network from filename, e.g., "TensorFuzz" for "TensorFuzz.pbtxt" and "resnet" for
+# "resnet/saved_model.pb" or "resnet/".
+def network_name(filename):
+    if is_saved_model(filename):
+        if not os.path.isdir(filename):
+            filename = os.path.dirname(filename)
+        return os.path.basename(os.path.normpath(filename))
+    name = os.path.basename(filename)
+    for suffix in [".meta.pbtxt", ".pbtxt", ".pb", ".meta"]:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
@@ -1,24 +1,58 @@
 '''https://github.com/tensorflow/tensorflow/blob/master/tensorflow/core/framework/tensor.proto'''
 
-from tensorflow.python.framework import tensor_util
 import ast
 import numpy as np
-import z3
 
 from solver import Range
+from parse.range_spec import dtype_name
 from parse.specified_ranges import SpecifiedRanges
-from utils import *
+from parse.shape_inference import make_ndarray
+from utils import OVERFLOW_LIMIT, shape_from_proto
 
 placeholder_map = {}
 unbounded_weight = False
 unbounded_input = False
+# the ranges of the inputs not specified in SpecifiedRanges.ranges_looking_up: a dict from the names of data types to
+# their ranges, and then the policy (see parse/range_spec.py) with the range of the policy "default"
+dtype_ranges = {}
+range_policy = "prompt"
+default_range = None
+# the names of the parsed nodes whose abstracted outputs depend on unbounded_weight and on unbounded_input
+weight_sources = set()
+input_sources = set()
+
+
+# returns the ranges of the count components (None for a single input) of node of data types dtypes which are not
+# specified in SpecifiedRanges.ranges_looking_up, according to dtype_ranges and range_policy. Returns None if the
+# range should be asked at the console.
+def unspecified_range(node, dtypes, count=None):
+    if all(dtype_name(dtype) in dtype_ranges for dtype in dtypes) and len(dtypes) == (count or 1):
+        ranges = [dtype_ranges[dtype_name(dtype)] for dtype in dtypes]
+        return ranges if count is not None else ranges[0]
+    if range_policy == "prompt":
+        return None
+    if range_policy == "fail":
+        raise ValueError("the range of %s (%s) is not specified" % (node.name, node.op))
+    rng = [None, None] if range_policy == "unbounded" else default_range
+    return [rng] * count if count is not None else rng
+
+
+# returns the ranges of the count components of the iterator node specified by rng, where a single range is shared by
+# all components. Raises ValueError if rng gives another number of ranges.
+def component_ranges(node, rng, count):
+    if np.array(rng, dtype=object).shape == (2,):
+        return [rng] * count
+    if np.array(rng, dtype=object).shape != (count, 2):
+        raise ValueError("the ranges of %s (%s) do not match its %d components: %s" % (node.name, node.op, count,
+                                                                                       str(rng)))
+    return rng
 
 
 # parses the constant values from the node attribute
 def const(node):
     attrs = node.attr
     tensor = attrs["value"].tensor
-    value = tensor_util.MakeNdarray(tensor)
+    value = make_ndarray(tensor)
     return value
 
 
@@ -30,6 +64,7 @@ def iteratorv2(node):
 
 # parses the weights obtained by the variablev2 operation, and returns a Range object
 def variablev2(node):
+    weight_sources.add(node.name)
     if unbounded_weight:
         return Range(left=-OVERFLOW_LIMIT, right=OVERFLOW_LIMIT)
     attrs = node.attr
@@ -49,19 +84,24 @@ def variablev2(node):
 
 # parses the inputs obtained by the oneshotiterator operation, and returns a list of Range objects
 def oneshotiterator(node):
-    if node.name in placeholder_map:
-        return placeholder_map[node.name]
+    input_sources.add(node.name)
     attrs = node.attr
     shapes = attrs["shapes"].list.shape
     output_shapes = attrs["output_shapes"].list.shape
     if len(output_shapes) > len(shapes):
         shapes = output_shapes
+    # checked before placeholder_map, which keeps the specified ranges across the settings of run_all_configs
     if unbounded_input:
         return [Range(left=-OVERFLOW_LIMIT, right=OVERFLOW_LIMIT) for _ in range(len(shapes))]
+    if node.name in placeholder_map:
+        return placeholder_map[node.name]
     value = []
     if node.name in SpecifiedRanges.ranges_looking_up:
-        input_list = SpecifiedRanges.ranges_looking_up[node.name]
+        input_list = component_ranges(node, SpecifiedRanges.ranges_looking_up[node.name], len(shapes))
     else:
+        dtypes = attrs["output_types"].list.type if "output_types" in attrs else []
+        input_list = unspecified_range(node, dtypes, len(shapes))
+    if input_list is None:
         print(node)
         while True:
             x = input("Please specify the range of inputs\n"
@@ -94,6 +134,7 @@ def oneshotiterator(node):
 
 # parses the inputs obtained by the placeholder operation, and returns a Range object
 def placeholder(node, weight=False):
+    (weight_sources if weight else input_sources).add(node.name)
     if unbounded_input and not weight:
         return Range(left=-OVERFLOW_LIMIT, right=OVERFLOW_LIMIT)
     if node.name in placeholder_map:
@@ -104,6 +145,8 @@ def placeholder(node, weight=False):
     if node.name in SpecifiedRanges.ranges_looking_up:
         rng = SpecifiedRanges.ranges_looking_up[node.name]
     else:
+        rng = unspecified_range(node, [dtype])
+    if rng is None:
         print(node)
         while True:
             x = input("Please specify the range of the placeholder \n"
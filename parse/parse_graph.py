@@ -1,281 +1,529 @@
-from google.protobuf import text_format
-import tensorflow as tf
+from parse.graph_loader import load_graph_def
+import parse.graph_cache as graph_cache
+from parse.shape_inference import num_outputs, infer_output_signatures, tensorflow_output_signatures
+from parse.slice_index import SliceIndex, is_gradient
 from analysis.inference import InferValue, InferArray, identity, dumy
 from analysis.abstract_interpretation import AbstractInterpretation
-import queue
-from graphviz import Digraph
-import warnings
-import z3
-from solver import meet, meet_relation_variable, magic
+from collections import deque, OrderedDict
+import tracer
+from solver import meet, meet_relation_variable, magic, same_value, same_array
 from solver import Range, Array, Solver
-from utils import *
+from utils import shape_from_proto
 import numpy as np
-import copy
 
 turn_on_array = True
+# the number of backward slices whose forward cones are memoized
+cone_index_size = 16
+# the maximum number of reevaluated abstracted outputs kept in the overlay states shared by the reevaluations of
+# different suspects (see Graph.reevaluate)
+overlay_cache_size = 1 << 16
+# whether to import the GraphDef into TensorFlow to obtain the shapes and data types of tensors. Otherwise, they are
+# obtained from the "_output_shapes" attributes and the shape functions in parse/shape_inference.py.
+use_tensorflow_shapes = False
 
 
 # implements the disjoint-set data structure https://en.wikipedia.org/wiki/Disjoint-set_data_structure
-# for identifying the largest connected component in the parsed computation graph.
+# for identifying the largest connected component in the parsed computation graph. The elements are the ids of nodes
+# 0, 1, ..., n - 1. find uses path halving and union uses union by size, so neither of them is recursive.
 class UnionSet:
-    def __init__(self, eles):
-        self.f = {}
-        self.rank = {}
-        for ele in eles:
-            self.f[ele] = ele
-            self.rank[ele] = 1
+    def __init__(self, n):
+        self.f = list(range(n))
+        self.size = [1] * n
 
     def find(self, x):
-        if self.f[x] == x:
-            return x
-        self.f[x] = self.find(self.f[x])
-        self.rank[x] = self.rank[self.f[x]]
-        return self.f[x]
+        f = self.f
+        while f[x] != x:
+            f[x] = f[f[x]]
+            x = f[x]
+        return x
 
     def union(self, x, y):
         """merge y to x"""
         u = self.find(x)
         v = self.find(y)
         if u != v:
-            if self.rank[u] < self.rank[v]:
+            if self.size[u] < self.size[v]:
                 u, v = v, u
             self.f[v] = u
-            self.rank[u] += self.rank[v]
+            self.size[u] += self.size[v]
+
+
+# stores the edges of a graph over the node ids 0, 1, ..., n - 1 in the compressed sparse row (CSR) format: the
+# neighbors of node i are indices[indptr[i]:indptr[i + 1]], in the order in which the edges are given, and data holds
+# an integer attached to each edge (e.g., the edge index).
+class CSRGraph:
+    def __init__(self, n, src, dst, data=None):
+        src = np.asarray(src, dtype=np.int64)
+        order = np.argsort(src, kind="stable")  # a stable sort keeps the order of the neighbors of each node
+        self.indices = np.asarray(dst, dtype=np.int32)[order]
+        self.data = None if data is None else np.asarray(data, dtype=np.int32)[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def edge_data(self, i):
+        return self.data[self.indptr[i]:self.indptr[i + 1]]
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+
+# returns the strongly connected components of the subgraph of graph (a CSRGraph) induced by the nodes i with
+# in_subgraph[i] set, in the reversed topological order. It implements Tarjan's algorithm
+# https://en.wikipedia.org/wiki/Tarjan%27s_strongly_connected_components_algorithm with an explicit stack.
+def strongly_connected_components(graph, in_subgraph):
+    n = len(graph)
+    indptr = graph.indptr.tolist()
+    indices = graph.indices.tolist()
+    index = [-1] * n
+    low = [0] * n
+    on_stack = bytearray(n)
+    stack = []
+    sccs = []
+    cnt = 0
+    for root in range(n):
+        if not in_subgraph[root] or index[root] != -1:
+            continue
+        index[root] = low[root] = cnt
+        cnt += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, indptr[root])]  # (node, the position of the next edge to visit)
+        while len(work) > 0:
+            node, k = work[-1]
+            if k < indptr[node + 1]:
+                work[-1] = (node, k + 1)
+                next_node = indices[k]
+                if not in_subgraph[next_node]:
+                    continue
+                if index[next_node] == -1:
+                    index[next_node] = low[next_node] = cnt
+                    cnt += 1
+                    stack.append(next_node)
+                    on_stack[next_node] = 1
+                    work.append((next_node, indptr[next_node]))
+                elif on_stack[next_node]:
+                    low[node] = min(low[node], index[next_node])
+            else:
+                work.pop()
+                if len(work) > 0:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                if low[node] == index[node]:
+                    scc = []
+                    while True:
+                        x = stack.pop()
+                        on_stack[x] = 0
+                        scc.append(x)
+                        if x == node:
+                            break
+                    sccs.append(scc)
+    return sccs
+
+
+# is the evaluation plan of a node compiled once by Graph.compile_plan: the transfer functions in InferValue and
+# InferArray resolved from the operation type (None if not implemented), the ids of the non-control inputs with their
+# edge indices, and the node attribute in protocol buffer format passed to the transfer functions.
+class PlanEntry:
+    __slots__ = ["value_fn", "array_fn", "parents", "edge_index", "node", "unimplemented", "bool_output"]
+
+    def __init__(self, node, parents, edge_index, dtype):
+        op = node.op.lower()
+        self.value_fn = getattr(InferValue, op, None)
+        self.array_fn = getattr(InferArray, op, None)
+        self.parents = parents
+        self.edge_index = edge_index
+        self.node = node
+        # whether the transfer function of the value is missing, which is reported by forward_analysis. Assert and
+        # NextIteration do not need one.
+        self.unimplemented = self.value_fn is None and op not in ["assert", "nextiteration"]
+        # the array is not computed for boolean tensors
+        if isinstance(dtype, list):
+            self.bool_output = any(int(x) == 10 for x in dtype)
+        else:
+            self.bool_output = dtype is not None and int(dtype) == 10
+
+
+# is the abstract state of a reevaluation: the abstracted outputs written in the reevaluation are stored in overlay,
+# and the other ones are read from base (a list indexed by the node ids), which is never modified.
+class OverlayState:
+    def __init__(self, base):
+        self.base = base
+        self.overlay = {}
+
+    def __getitem__(self, son):
+        if son in self.overlay:
+            return self.overlay[son]
+        return self.base[son]
+
+    def __setitem__(self, son, abstract_interpretation):
+        self.overlay[son] = abstract_interpretation
+
+
+# returns a new AbstractInterpretation object which is abstract_interpretation with value replaced, sharing the other
+# fields.
+def with_value(abstract_interpretation, value):
+    return AbstractInterpretation(size=abstract_interpretation.size, value=value, dtype=abstract_interpretation.dtype,
+                                  array=abstract_interpretation.array)
 
 
 # implements the parsing process of the Protocol Buffer file to the computation graph and the process of static
 # dataflow analysis, as well as other functionalities that are related to the computation graph.
+# filename can be a GraphDef in the text (.pbtxt) or the binary (.pb) format, a MetaGraphDef (.meta) or a SavedModel.
+# signature and tags choose the MetaGraphDef and the signature to analyze (see parse/graph_loader.py).
+# If cache_dir is not None, the built graph is stored in (or restored from) a cache file in cache_dir keyed by the hash
+# of the file (see parse/graph_cache.py).
+# Nodes are identified by their ids, i.e., their positions in the GraphDef. The names of nodes are only used at the
+# boundary: node_ids maps a name to its id, node_names maps an id back to the name, and the symbols in Array objects
+# are names.
 class Graph:
-    def __init__(self, filename, verbose_file=None):
-        with open(filename) as f:
-            txt = f.read()
-            self.graph_def = text_format.Parse(txt, tf.GraphDef())
-            tf.import_graph_def(self.graph_def, name="")
-            self.tf_graph = tf.get_default_graph()
-        # storing the reversed edges of the computation graph
-        self.graph_backward = [{}, {}]  # [0] for non_control; [1] for control
+    def __init__(self, filename, signature=None, tags=None, cache_dir=None):
+        self.graph_def = None
+        # are the node attributes in protocol buffer format, the names of nodes and the map from names to ids
+        self.nodes = []
+        self.node_names = []
+        self.node_ids = {}
+        # storing the reversed edges of the computation graph, whose edge data of non-control edges is the edge index
+        # (-1 if the output of the input node is not a list)
+        self.backward = [None, None]  # [0] for non_control; [1] for control
         # storing the edges of the computation graph
-        self.graph_forward = [{}, {}]  # [0] for non_control; [1] for control
-        # is a map mapping from the name of an operation (string) to the node attribute in protocol buffer format
-        self.node_by_name = {}
-        self.f = UnionSet([node.name for node in self.graph_def.node])
-        # is a map mapping from the name of an operation (string) to an AbstractInterpretation object (or a list of
+        self.forward = [None, None]  # [0] for non_control; [1] for control
+        self.f = None
+        # is a list mapping from the id of an operation to an AbstractInterpretation object (or a list of
         # AbstractInterpretation objects) denoting the output of the node computed by dataflow analysis.
-        self.node_output = {}
-        # is a map mapping from the name of an operation to a list. The list indicates which value is passed to the
-        # next node if the output of the current node is a list of AbstractInterpretation objects.
-        self.edge_index = {}
-        # is a set storing which nodes have been visited by data flow analysis and it is used for incremental
+        self.node_output = []
+        # is the node_output built before any dataflow analysis, which is restored by invalidate
+        self.built_output = []
+        # is a bytearray storing which nodes have been visited by data flow analysis and it is used for incremental
         # dataflow analysis.
-        self.node_visited = set()
+        self.node_visited = bytearray()
         self.unique_clique = []
         self.main_clique = None
-        # is a map mapping from tensor name to the operation (node) name
-        self.tensor_to_op = {}
-        # is a map mapping from an operation name to its topological order, instructing the order of dataflow analysis
-        self.nodes_in_main_clique_topology = {}
-        self.file = None if verbose_file is None else open(verbose_file, "w")
+        # is an array mapping from an operation id to its topological order (-1 for the nodes not in the main clique),
+        # instructing the order of dataflow analysis
+        self.topological_order = None
+        # is an array mapping from an operation id to the id of its strongly connected component in the main clique
+        # (-1 for the nodes not in the main clique). The components are numbered in the topological order.
+        self.scc_ids = None
+        # is a SliceIndex answering the backward slices of the nodes given to index_slices
+        self.slice_index = None
+        # is a list mapping from an operation id to its PlanEntry
+        self.plan = []
+        # is a map mapping from an operation id to the set of ids of nodes that its reevaluation depends on (see
+        # dependencies)
+        self.dependency_cache = {}
+        # maps node_interested of reevaluate to the index of its backward slice used by forward_cone, for the most
+        # recently used slices
+        self.cone_index = OrderedDict()
+        # maps the overrides of reevaluate to (the overlay state, the ids of changed nodes, the ids of nodes whose
+        # reevaluated outputs are decided) for the most recently used overrides, and the number of outputs in the
+        # overlay states
+        self.overlay_cache = OrderedDict()
+        self.overlay_cache_outputs = 0
+
+        key = None
+        if cache_dir is not None:
+            key = graph_cache.cache_key(filename, signature, tags, use_tensorflow_shapes)
+            if graph_cache.load(cache_dir, key, self):
+                self.compile_plan()
+                return
+        self.graph_def = load_graph_def(filename, signature, tags)
         self.build()
-
-    def write(self, x):
-        if self.file is None:
-            print(x)
-        else:
-            self.file.write(str(x) + "\n")
+        if key is not None:
+            graph_cache.save(cache_dir, key, self)
+        self.compile_plan()
+
+    # assigns the ids of nodes in graph_def.
+    def index_nodes(self):
+        self.nodes = list(self.graph_def.node)
+        self.node_names = [node.name for node in self.nodes]
+        self.node_ids = {name: i for (i, name) in enumerate(self.node_names)}
+        self.node_visited = bytearray(len(self.nodes))
+
+    # returns the ids of the non-control inputs of node son and the edge indices (None if the output of the input node
+    # is not a list).
+    def inputs_of(self, son):
+        return self.backward[0].neighbors(son).tolist(), [None if x < 0 else x for x in
+                                                          self.backward[0].edge_data(son).tolist()]
+
+    # compiles the evaluation plan of every node, so that dataflow analysis does not resolve the transfer functions and
+    # the inputs of a node every time the node is evaluated.
+    def compile_plan(self):
+        self.plan = []
+        for (son, node) in enumerate(self.nodes):
+            parents, edge_index = self.inputs_of(son)
+            self.plan.append(PlanEntry(node, parents, edge_index, self.node_output[son].dtype))
+        self.built_output = list(self.node_output)
+
+    # forgets the results of dataflow analysis of the nodes (ids) in sources and of the nodes depending on them, e.g.,
+    # when the ranges of some inputs change, so that the next forward_analysis evaluates them again while the results
+    # of the other nodes are kept. Returns the ids of the forgotten nodes.
+    def invalidate(self, sources):
+        invalidated = set()
+        stack = [son for son in sources if self.node_visited[son]]
+        invalidated.update(stack)
+        while len(stack) > 0:
+            son = stack.pop()
+            for is_control in [0, 1]:
+                for x in self.forward[is_control].neighbors(son).tolist():
+                    if self.node_visited[x] and x not in invalidated:
+                        invalidated.add(x)
+                        stack.append(x)
+        for son in invalidated:
+            self.node_visited[son] = False
+            self.node_output[son] = self.built_output[son]
+        # the caches of reevaluation are built on the forgotten results
+        self.dependency_cache.clear()
+        self.cone_index.clear()
+        self.overlay_cache.clear()
+        self.overlay_cache_outputs = 0
+        return invalidated
+
+    # builds the index of the backward slices starting at the node ids in roots (see parse/slice_index.py), which is
+    # used by forward_analysis instead of computing every backward slice from scratch. The index only depends on the
+    # structure of the graph, so an index already covering roots is kept, e.g., when the graph is analyzed again after
+    # invalidate.
+    def index_slices(self, roots):
+        if self.slice_index is not None and all(root in self.slice_index or self.scc_ids[root] < 0 for root in roots):
+            return
+        self.slice_index = SliceIndex(self, roots)
+
+    # returns the number of nodes in the main clique.
+    def main_clique_size(self):
+        return int(np.count_nonzero(self.topological_order >= 0))
+
+    # computes the number of outputs of every node. The numbers of outputs are inferred from the GraphDef (see
+    # parse/shape_inference.py) or obtained by importing the GraphDef into TensorFlow if use_tensorflow_shapes is True.
+    # Returns the numbers of outputs and the output signatures (None if not imported into TensorFlow), as lists indexed
+    # by the node ids.
+    def build_arity(self):
+        if use_tensorflow_shapes:
+            output_signatures = tensorflow_output_signatures(self.graph_def)
+            output_signatures = [output_signatures[name] for name in self.node_names]
+            return [len(shapes) for (shapes, _) in output_signatures], output_signatures
+
+        max_consumed_index = {}
+        for node in self.nodes:
+            for in_node_raw in node.input:
+                if in_node_raw[0] == '^':
+                    continue
+                pos = in_node_raw.rfind(':')
+                if pos != -1 and in_node_raw[pos + 1:].isdigit():
+                    in_node = in_node_raw[:pos]
+                    max_consumed_index[in_node] = max(max_consumed_index.get(in_node, -1),
+                                                      int(in_node_raw[pos + 1:]))
+        return [num_outputs(node, max_consumed_index.get(node.name, -1)) for node in self.nodes], None
 
     # parses the Protocol Buffer format, builds the computation graph, and the topological order of the nodes.
     def build(self):
-        for node in self.graph_def.node:
-            self.node_by_name[node.name] = node
-            self.node_output[node.name] = AbstractInterpretation()
-        for op in self.tf_graph.get_operations():
-            for tensor in op.values():
-                self.tensor_to_op[tensor.name] = op.name
+        self.index_nodes()
+        n = len(self.nodes)
+        self.f = UnionSet(n)
+        arity, output_signatures = self.build_arity()
 
         # parse the protocol buffer format and builds the computation graph.
-        for node in self.graph_def.node:
-            self.graph_backward[0][node.name] = []
-            self.graph_backward[1][node.name] = []
-            self.edge_index[node.name] = []
-            node_values = self.tf_graph.get_operation_by_name(node.name).values()
-
-            if node_values is None or len(node_values) == 0:
-                self.node_output[node.name] = AbstractInterpretation()
-            elif len(node_values) > 1:
-                self.node_output[node.name] = AbstractInterpretation(
-                    size=[node_value.shape for node_value in node_values],
-                    dtype=[node_value.dtype for node_value in node_values],
-                    array=[Array(node.name + "|" + str(i), node_value.shape) for
-                           (i, node_value) in enumerate(node_values)])
-            else:
-                self.node_output[node.name] = AbstractInterpretation(
-                    size=node_values[0].shape, dtype=node_values[0].dtype,
-                    array=Array(node.name, node_values[0].shape))
+        inputs = []
+        edges = [([], [], []), ([], [])]  # (son, input node, edge index) for non_control; (son, input node) for control
+        for (son, node) in enumerate(self.nodes):
+            inputs.append([])
             for in_node_raw in node.input:
                 is_control = False
                 if in_node_raw[0] == '^':
                     in_node_raw = in_node_raw[1:]
                     is_control = True
 
-                if in_node_raw in self.tensor_to_op:  # if the input is defined by the tensor's name
-                    in_node = self.tensor_to_op[in_node_raw]
-
-                    in_tensor_names = [tensor.name for tensor in self.tf_graph.get_operation_by_name(
-                        self.tensor_to_op[in_node_raw]).values()]
-                    if not is_control:
-                        self.edge_index[node.name].append(None if len(
-                            in_tensor_names) == 1 else in_tensor_names.index(in_node_raw))
+                pos = in_node_raw.rfind(':')
+                if pos != -1 and in_node_raw[pos + 1:].isdigit() and in_node_raw[:pos] in self.node_ids and \
+                        int(in_node_raw[pos + 1:]) < arity[self.node_ids[in_node_raw[:pos]]]:
+                    # if the input is defined by the tensor's name
+                    in_node = self.node_ids[in_node_raw[:pos]]
+                    index = int(in_node_raw[pos + 1:])
                 else:  # if the input is defined by the operation's name
-                    in_node = in_node_raw
-
-                    in_tensor_names = [tensor.name for tensor in self.tf_graph.get_operation_by_name(
-                        in_node_raw).values()]
-                    if not is_control:
-                        self.edge_index[node.name].append(None if len(in_tensor_names) == 1 else 0)
-
-                if in_node not in self.graph_forward[0]:
-                    self.graph_forward[0][in_node] = []
-                    self.graph_forward[1][in_node] = []
-                self.graph_forward[is_control][in_node].append(node.name)
-                self.graph_backward[is_control][node.name].append(in_node)
-                self.f.union(in_node, node.name)
+                    in_node = self.node_ids[in_node_raw]
+                    index = 0
+                edges[is_control][0].append(son)
+                edges[is_control][1].append(in_node)
+                if not is_control:
+                    edges[0][2].append(-1 if arity[in_node] == 1 else index)
+                    inputs[son].append((in_node, None if arity[in_node] == 1 else index))
+                self.f.union(in_node, son)
+
+        for is_control in range(2):
+            self.backward[is_control] = CSRGraph(n, edges[is_control][0], edges[is_control][1],
+                                                 edges[is_control][2] if is_control == 0 else None)
+            self.forward[is_control] = CSRGraph(n, edges[is_control][1], edges[is_control][0])
+
+        if output_signatures is None:
+            output_signatures = infer_output_signatures(self.nodes, inputs, arity)
+        self.node_output = []
+        for (node, (shapes, dtypes)) in zip(self.nodes, output_signatures):
+            if len(shapes) == 0:
+                self.node_output.append(AbstractInterpretation())
+            elif len(shapes) > 1:
+                self.node_output.append(AbstractInterpretation(
+                    size=shapes, dtype=dtypes,
+                    array=[Array(node.name + "|" + str(i), shape) for (i, shape) in enumerate(shapes)]))
+            else:
+                self.node_output.append(AbstractInterpretation(
+                    size=shapes[0], dtype=dtypes[0], array=Array(node.name, shapes[0])))
 
         max_rank = 0
-        for node in self.f.f:
+        for node in range(n):
             if self.f.find(node) == node:
                 self.unique_clique.append(node)
-                max_rank = max(max_rank, self.f.rank[node])
-
-        for node_name in self.unique_clique:
-            if max_rank == self.f.rank[node_name]:
-                self.main_clique = node_name
-
-        node_inds = {}
-        q = queue.Queue()
-        nodes_in_main_clique = set()
+                max_rank = max(max_rank, self.f.size[node])
+
+        for node in self.unique_clique:
+            if max_rank == self.f.size[node]:
+                self.main_clique = node
+
+        self.build_topological_order()
+
+    # builds topological_order instructing the order of dataflow analysis. The strongly connected components (SCCs) of
+    # the main clique are ordered topologically. A non-trivial SCC is a loop frame, which is scheduled as a unit: the
+    # back edges NextIteration -> Merge are removed, and the rest of the frame is ordered by Kahn's algorithm. Every
+    # node and edge is visited a constant number of times.
+    def build_topological_order(self):
+        n = len(self.nodes)
+        in_main_clique = bytearray(n)
+        for node in range(n):
+            if self.f.find(node) == self.main_clique:
+                in_main_clique[node] = 1
+
+        self.topological_order = np.full(n, -1, dtype=np.int64)
+        self.scc_ids = np.full(n, -1, dtype=np.int64)
         cnt = 0
-        for node_name in self.f.f:
-            node_inds[node_name] = 0 if node_name not in self.graph_backward[0] else len(
-                self.graph_backward[0][node_name])  # is sufficient to only query in self.graph_backward[0]
-            if self.f.find(node_name) == self.main_clique:
-                nodes_in_main_clique.add(node_name)
-
-        for node_name in nodes_in_main_clique:
-            if node_inds[node_name] == 0:
-                q.put(node_name)
-
-        # build nodes_in_main_clique_topology instructing the order of dataflow analysis
-        while True:
-            while not q.empty():
-                son = q.get()
-                nodes_in_main_clique.remove(son)
-                self.nodes_in_main_clique_topology[son] = cnt
+        # Tarjan's algorithm returns the SCCs in the reversed topological order
+        for (scc_id, scc) in enumerate(reversed(strongly_connected_components(self.forward[0], in_main_clique))):
+            self.scc_ids[scc] = scc_id
+            if len(scc) == 1:
+                self.topological_order[scc[0]] = cnt
                 cnt += 1
-                if son in self.graph_forward[0]:
-                    for next_node_name in self.graph_forward[0][son]:
-                        node_inds[next_node_name] -= 1
-                        if node_inds[next_node_name] == 0 and next_node_name in nodes_in_main_clique:
-                            q.put(next_node_name)
-
-            if len(nodes_in_main_clique) == 0:
-                break
-
-            # identify loops
-            min_ind = None
-            for node_name in nodes_in_main_clique:
-                if self.node_by_name[node_name].op == "Merge":
-                    can_add = True
-                    for in_node_name in self.graph_backward[0][node_name]:
-                        if in_node_name in nodes_in_main_clique and self.node_by_name[
-                            in_node_name].op != "NextIteration":
-                            # if a Merge is not dominated by a NextIteration, then we cannot add it into the queue
-                            can_add = False
-                            break
-
-                    if can_add and (min_ind is None or node_inds[node_name] < node_inds[min_ind]):
-                        min_ind = node_name
-
-            assert min_ind is not None
-            q.put(min_ind)
-
-    # returns a list of nodes in the backward slice starting at node
-    def backward_slice(self, node, visited, non_control_only=True):  # return a list of nodes
-        visited.add(node)
-        ret = [node]
-        for in_node in self.graph_backward[0][node]:
-            if in_node not in visited:
-                ret.extend(self.backward_slice(in_node, visited))
-        if not non_control_only:
-            for in_node in self.graph_backward[1][node]:
-                if in_node not in visited:
-                    ret.extend(self.backward_slice(in_node, visited))
-
-        return ret
+                continue
 
+            in_scc = set(scc)
+            node_inds = {node: 0 for node in scc}
+            next_nodes = {}
+            for node in scc:
+                next_nodes[node] = [next_node for next_node in self.forward[0].neighbors(node).tolist() if
+                                    next_node in in_scc and not (self.nodes[node].op == "NextIteration" and self.nodes[
+                                        next_node].op == "Merge")]
+                for next_node in next_nodes[node]:
+                    node_inds[next_node] += 1
+
+            q = deque([node for node in scc if node_inds[node] == 0])
+            scheduled = 0
+            while len(q) > 0:
+                son = q.popleft()
+                self.topological_order[son] = cnt
+                cnt += 1
+                scheduled += 1
+                for next_node in next_nodes[son]:
+                    node_inds[next_node] -= 1
+                    if node_inds[next_node] == 0:
+                        q.append(next_node)
+
+            # a cycle not closed by a NextIteration -> Merge edge is not a loop of TensorFlow
+            assert scheduled == len(scc)
+
+    # returns an array of the node ids in the backward slice starting at node, in the depth-first order. The slice is
+    # computed with an explicit stack and a visited bitset instead of recursion. non_control_only is a flag
+    # instructing the method whether to visit control flow edges.
+    def backward_slice(self, node, non_control_only=True):
+        visited = bytearray(len(self.nodes))
+        visited[node] = 1
+        ret = []
+        stack = [node]
+        while len(stack) > 0:
+            son = stack.pop()
+            ret.append(son)
+            in_nodes = self.backward[0].neighbors(son).tolist()
+            if not non_control_only:
+                in_nodes += self.backward[1].neighbors(son).tolist()
+            for in_node in reversed(in_nodes):  # visits the inputs in their order
+                if not visited[in_node]:
+                    visited[in_node] = 1
+                    stack.append(in_node)
+
+        return np.array(ret, dtype=np.int64)
+
+    # draws the subgraph induced by the node ids in clique.
     def draw(self, clique, filename):
+        from graphviz import Digraph  # graphviz is only needed for drawing
         dot = Digraph()
         clique = set(clique)
         for x in clique:
-            dot.node(x, self.node_by_name[x].op)
+            dot.node(self.node_names[x], self.nodes[x].op)
 
-        for node_name in clique:
-            if node_name in self.graph_forward[0]:
-                for is_contorl in range(2):
-                    for next_node_name in self.graph_forward[is_contorl][node_name]:
-                        if next_node_name in clique:
-                            dot.edge(node_name, next_node_name, color="blue" if is_contorl == 0 else "red")
+        for node in clique:
+            for is_contorl in range(2):
+                for next_node in self.forward[is_contorl].neighbors(node).tolist():
+                    if next_node in clique:
+                        dot.edge(self.node_names[node], self.node_names[next_node],
+                                 color="blue" if is_contorl == 0 else "red")
 
         dot.render("./%s.gv" % filename, view=False)
 
-    # calculates the abstracted output of node son with its attribute u in protocol buffer format according to the
-    # abstractions of its inputs while the abstracted outputs of some nodes have been overridden in override_dict.
+    # calculates the abstracted output of node son (an id) following its plan entry according to the abstractions of its
+    # inputs while the abstracted outputs of some nodes have been overridden in override_dict.
     # override_dict is a map mapping the names to their overridden abstractions. It will only be used in predicate
     # splitting and handling element-wise Select operation.
-    def summary_node(self, son, u, override_dict={}):
-        self.write(son)
+    # The abstracted outputs are read from and written to state, which is node_output by default or an OverlayState in
+    # reevaluation. The AbstractInterpretation objects in state are never modified: a new object is stored instead.
+    def summary_node(self, son, override_dict={}, state=None):
+        if state is None:
+            state = self.node_output
+        son_name = self.node_names[son]
+        tracer.trace(tracer.NODE, "node", name=son_name)
+        entry = self.plan[son]
+        u = entry.node
+        parents, edge_index = entry.parents, entry.edge_index  # only care about non_control edges
         parents_aps = []
         all_none = True
-        for (i, in_node_name) in enumerate(self.graph_backward[0][son]):  # only care about non_control edges
-            if in_node_name not in self.node_visited:
+        for (i, in_node) in enumerate(parents):
+            if not self.node_visited[in_node]:
                 # there is a loop, and the node is "Merge"
-                assert self.node_by_name[in_node_name].op == "NextIteration"
-                self.node_visited.add(in_node_name)
-                self.node_output[in_node_name].value = dumy()
+                assert self.nodes[in_node].op == "NextIteration"
+                self.node_visited[in_node] = True
+                state[in_node] = with_value(state[in_node], dumy())
 
-            parents_aps.append(self.node_output[in_node_name].index_of(self.edge_index[son][i]))
+            parents_aps.append(state[in_node].index_of(edge_index[i]))
             all_none &= parents_aps[-1].has_none()
 
         temp = None
         temp_array = None
         if all_none and len(parents_aps) > 0:
-            warnings.warn("fail to analysis %s due to None" % son, RuntimeWarning)
+            tracer.warn("None", son_name)
         else:
-            try:
-                temp = getattr(InferValue, u.op.lower())(parents_aps, u)
-                if temp is not None and isinstance(temp, tuple):
-                    raise AssertionError
-            except AttributeError:
-                if u.op.lower() in ["assert"]:
-                    pass
-                else:
+            if entry.value_fn is None:
+                if u.op.lower() not in ["assert"]:
+                    tracer.warn("NotImplemented", son_name)
+            else:
+                try:
+                    temp = entry.value_fn(parents_aps, u)
+                    if temp is not None and isinstance(temp, tuple):
+                        raise AssertionError
+                except AttributeError:
                     temp = None
-                    warnings.warn("fail to analysis %s due to NotImplemented" % son, RuntimeWarning)
-            except AssertionError:
-                raise AssertionError
+                    tracer.warn("NotImplemented", son_name)
+                except AssertionError:
+                    raise AssertionError
 
             # TODO refactor the handling of Select operation to analysis/inference.py
             if u.op == "Select":  # special treatment for Select
-                compare_node_name = self.graph_backward[0][son][0]
-                compare_node = self.node_by_name[compare_node_name]
-                branch_node_name = self.graph_backward[0][son][1:]
-                branch_value = [self.node_output[branch_node_name[i - 1]].index_of(self.edge_index[son][i]).value for i
-                                in range(1, 3)]
-                branch_array = [self.node_output[branch_node_name[i - 1]].index_of(self.edge_index[son][i]).array for i
-                                in range(1, 3)]
+                compare_node_id = parents[0]
+                compare_node = self.nodes[compare_node_id]
+                branch_node = parents[1:]
+                branch_value = [state[branch_node[i - 1]].index_of(edge_index[i]).value for i in range(1, 3)]
+                branch_array = [state[branch_node[i - 1]].index_of(edge_index[i]).array for i in range(1, 3)]
                 if compare_node.op in ["GreaterEqual", "Greater", "LessEqual", "Less", "Equal", "NotEqual"]:
-                    args = self.graph_backward[0][compare_node_name]  # args --> compare_node_name --> son
-                    range_args = [identity([self.node_output[args[i]].index_of(self.edge_index[compare_node_name][i])])
-                                  for i in range(2)]
+                    args, args_edge_index = self.plan[compare_node_id].parents, self.plan[
+                        compare_node_id].edge_index  # args --> compare_node_id --> son
+                    range_args = [identity([state[args[i]].index_of(args_edge_index[i])]) for i in range(2)]
 
                     # check whether the cond tensor can be determined to be all true or all false
                     def can_determine():
@@ -327,7 +575,7 @@ class Graph:
                         # single_value_array: partitions depend on only one variable in linear affine relation without
                         # relu.
                         for i in range(2):
-                            array = self.node_output[args[i]].index_of(self.edge_index[compare_node_name][i]).array
+                            array = state[args[i]].index_of(args_edge_index[i]).array
                             single_value_array = True
                             for key in array.block_to_symbol:
                                 group = array.block_to_symbol[key]
@@ -356,7 +604,7 @@ class Graph:
                                                 factor = group.value[(name, position)]
                                                 if factor == 0:
                                                     continue
-                                                value = self.get_value(name)
+                                                value = self.get_value(name, state)
                                                 rhs = c * (1 / factor)
                                                 if factor < 0:
                                                     rhs = Range(left=rhs.right, right=rhs.left)
@@ -373,7 +621,8 @@ class Graph:
                                                         right=min(value.right, rhs.right))
 
                                     values.append(self.get_left_right(branch_array[branch_id_select].block_to_symbol,
-                                                                      branch_node_name[branch_id_select], override_dict))
+                                                                      self.node_names[branch_node[branch_id_select]],
+                                                                      override_dict, state))
                                     if values[-1] is None:
                                         return None
                                 return Range(left=min(values[0].left, values[1].left),
@@ -392,7 +641,7 @@ class Graph:
                                                 factor = group.value[(name, position)]
                                                 if factor == 0:
                                                     continue
-                                                value = self.get_value(name)
+                                                value = self.get_value(name, state)
                                                 rhs = c * (1 / factor)
                                                 if factor < 0:
                                                     rhs = Range(left=rhs.right, right=rhs.left)
@@ -406,7 +655,8 @@ class Graph:
                                                     pass
 
                                     values.append(self.get_left_right(branch_array[branch_id_select].block_to_symbol,
-                                                                      branch_node_name[branch_id_select], override_dict))
+                                                                      self.node_names[branch_node[branch_id_select]],
+                                                                      override_dict, state))
                                     if values[-1] is None:
                                         return None
                                 return Range(left=min(values[0].left, values[1].left),
@@ -428,94 +678,85 @@ class Graph:
                             if temp_ret is not None:
                                 temp = temp_ret
 
-            if turn_on_array:
+            if turn_on_array and entry.array_fn is not None:
                 try:
                     for parents_ap in parents_aps:
                         assert parents_ap.array.index_slices is not None
-                    temp_array = getattr(InferArray, u.op.lower())(parents_aps, u)
-                    flag = True
-                    if isinstance(self.node_output[son].dtype, list):
-                        for x in self.node_output[son].dtype:
-                            if int(x) == 10:
-                                flag = False
-                                break
-                    else:
-                        flag = int(self.node_output[son].dtype) != 10
-
-                    if not flag:
+                    temp_array = entry.array_fn(parents_aps, u)
+                    if entry.bool_output:
                         temp_array = None
                 except AttributeError:
                     pass
                 except AssertionError:
                     pass
 
-        self.node_output[son].value = temp
+        # the abstracted output is a new object, so that the previous one is never modified
+        ret = with_value(state[son], temp)
+        state[son] = ret
 
         if temp_array is not None and isinstance(temp, Range):
-            self.node_output[son].array = temp_array
+            ret.array = temp_array
             if isinstance(temp_array, list):
                 temp = []
                 for (i, tmp_array) in enumerate(temp_array):
                     if temp_array[i].index_slices is None:
-                        temp.append(self.node_output[son].value[i])
+                        temp.append(ret.value[i])
                         continue
-                    value = self.get_left_right(tmp_array.block_to_symbol, son, override_dict)
+                    value = self.get_left_right(tmp_array.block_to_symbol, son_name, override_dict, state)
                     if value is None:
-                        temp.append(self.node_output[son].value[i])
+                        temp.append(ret.value[i])
                     else:
                         temp.append(value)
             elif temp_array.index_slices is not None:
-                value = self.get_left_right(temp_array.block_to_symbol, son, override_dict)
+                value = self.get_left_right(temp_array.block_to_symbol, son_name, override_dict, state)
                 if value is not None:
                     temp = value
 
-            self.node_output[son].value = temp
+            ret.value = temp
 
-        self.node_output[son].constraints = None
-        self.write(self.node_output[son])
+        if tracer.enabled(tracer.VALUE):
+            tracer.trace(tracer.VALUE, "output", name=son_name, value=str(ret))
 
-    # is the body of dataflow analysis. It computes the abstracted output of node_interested, and returns the ranges
-    # for predicate splitting. appended is the node of the unsafe operation.
+    # is the body of dataflow analysis. It computes the abstracted output of node_interested (an id), and returns the
+    # ranges for predicate splitting and the ids of nodes in the backward slice. appended is the id of the unsafe
+    # operation.
     def forward_analysis(self, node_interested, appended=None):
-        nodes_interested = self.backward_slice(node_interested.name, set(), True)  # only care about non_control edges
+        if self.slice_index is not None and node_interested in self.slice_index:
+            nodes_interested, has_gradient = self.slice_index.query(node_interested)
+        else:
+            nodes_interested = self.backward_slice(node_interested, True)  # only care about non_control edges
+            has_gradient = any(is_gradient(self.node_names[node]) for node in nodes_interested.tolist())
+            nodes_interested = nodes_interested[
+                np.argsort(self.topological_order[nodes_interested], kind="stable")].tolist()
         # we do not consider operations related to gradient descent.
-        for node in nodes_interested:
-            if "gradient" in node.lower() and "stopgradient" not in node.lower():
-                self.write("----------Gradients are not interested----------")
-                return None
+        if has_gradient:
+            tracer.trace(tracer.NODE, "skip", name=self.node_names[node_interested],
+                         reason="gradients are not interested")
+            return None
 
-        nodes_interested.sort(key=lambda x: self.nodes_in_main_clique_topology[x])
         if appended is not None:
-            if "gradient" in appended.name.lower() and "stopgradient" not in appended.name.lower():
-                self.write("----------Gradients are not interested----------")
+            if is_gradient(self.node_names[appended]):
+                tracer.trace(tracer.NODE, "skip", name=self.node_names[appended], reason="gradients are not interested")
                 return None
-            nodes_interested.append(appended.name)
+            nodes_interested.append(appended)
 
-        pre_check = True
         for son in nodes_interested[:-1]:
-            u = self.node_by_name[son]
-            try:
-                getattr(InferValue, u.op.lower())([], u)
-            except AttributeError:
-                if u.op.lower() not in ["assert", "nextiteration"]:
-                    print(u.op, " not Implemented!")
-            except:
-                pass
+            if self.plan[son].unimplemented:
+                print(self.nodes[son].op, " not Implemented!")
 
         for son in nodes_interested[:-1]:
-            u = self.node_by_name[son]
-            if son in self.node_visited:
+            if self.node_visited[son]:
                 continue
 
-            self.node_visited.add(son)
-            self.summary_node(son, u)
+            self.node_visited[son] = True
+            self.summary_node(son)
 
         range_to_split = set()
         for son in nodes_interested[:-1]:
-            u = self.node_by_name[son]
-            if u.op in ["Exp"]:  # if it is a non-linear function
-                in_node_name = self.graph_backward[0][son][0]
-                in_node_output = self.node_output[in_node_name].index_of(self.edge_index[son][0])
+            if self.nodes[son].op in ["Exp"]:  # if it is a non-linear function
+                parents, edge_index = self.plan[son].parents, self.plan[son].edge_index
+                in_node_name = self.node_names[parents[0]]
+                in_node_output = self.node_output[parents[0]].index_of(edge_index[0])
                 non_self = True
                 groups = in_node_output.array.block_to_symbol
                 range_to_split_local = set()
@@ -535,43 +776,126 @@ class Graph:
 
         return range_to_split, nodes_interested[:-1]
 
-    # reevaluates the dataflow analysis for nodes_interested which contains the nodes in the backward slice of
-    # node_interested. The reevaluation is implemented in an incremental manner, which only reevaluates the nodes which
-    # will be affected by nodes in changed. The abstracted outputs of nodes in changed are overridden in override_dict.
+    # returns the ids of nodes referenced by the linear affine relations in array (an Array object, a list of them, or
+    # None).
+    def array_symbols(self, array):
+        ret = set()
+        if array is None:
+            return ret
+        for x in array if isinstance(array, list) else [array]:
+            for linear in x.block_to_symbol.values():
+                for (name, position) in linear.value:
+                    if name[:len(magic)] == magic:
+                        name = name[len(magic):]
+                    if name.find('|') != -1:
+                        name = name[:name.find('|')]
+                    if name in self.node_ids:
+                        ret.add(self.node_ids[name])
+        return ret
+
+    # returns the ids of nodes whose abstracted outputs are read when son is summarized again after the dataflow
+    # analysis: its inputs and the nodes referenced by its tensor partition. For Select, the nodes read by the
+    # partitions of its branches, the inputs of the comparison and the nodes referenced by their partitions are also
+    # included. The tensor partition of son only changes if one of its inputs changes, so the abstracted outputs in
+    # node_output are used.
+    def dependencies(self, son):
+        if son not in self.dependency_cache:
+            entry = self.plan[son]
+            ret = set(entry.parents)
+            ret.update(self.array_symbols(self.node_output[son].array))
+            if entry.node.op == "Select":
+                for in_node in entry.parents[1:]:
+                    ret.update(self.array_symbols(self.node_output[in_node].array))
+                for in_node in self.plan[entry.parents[0]].parents:
+                    ret.add(in_node)
+                    ret.update(self.array_symbols(self.node_output[in_node].array))
+            self.dependency_cache[son] = ret
+        return self.dependency_cache[son]
+
+    # returns the ids of nodes in nodes_interested (the backward slice of node_interested in the topological order)
+    # which depend on the nodes in seeds directly or indirectly (see dependencies), in the topological order. The
+    # nodes depending on every node in the slice are indexed once per slice, and the cones are memoized, so that a
+    # cone costs time proportional to its size.
+    def forward_cone(self, nodes_interested, node_interested, seeds):
+        if node_interested in self.cone_index:
+            self.cone_index.move_to_end(node_interested)
+        else:
+            dependents = {}
+            for son in nodes_interested:
+                for x in self.dependencies(son):
+                    dependents.setdefault(x, []).append(son)
+            position = {son: i for (i, son) in enumerate(nodes_interested)}
+            self.cone_index[node_interested] = (dependents, position, {})
+            if len(self.cone_index) > cone_index_size:
+                self.cone_index.popitem(last=False)
+
+        dependents, position, cones = self.cone_index[node_interested]
+        seeds = frozenset(seeds)
+        if seeds not in cones:
+            visited = set()
+            stack = list(seeds)
+            while len(stack) > 0:
+                for son in dependents.get(stack.pop(), []):
+                    if son not in visited:
+                        visited.add(son)
+                        stack.append(son)
+            cones[seeds] = sorted(visited, key=position.__getitem__)
+        return cones[seeds]
+
+    # reevaluates the dataflow analysis for nodes_interested which contains the ids of nodes in the backward slice of
+    # node_interested. The reevaluation is implemented in an incremental manner, which only visits the forward cone of
+    # the nodes (ids) in changed and reevaluates the nodes which depend on nodes in changed. The abstracted outputs of
+    # nodes in changed are overridden in override_dict.
+    # A reevaluated node is added to changed only if its abstracted output differs from the one in node_output, so that
+    # the reevaluation stops at the nodes which are not affected. The reevaluated outputs are written to an
+    # OverlayState on node_output, so that node_output is never copied or restored.
+    # The reevaluated output of a node only depends on the overrides, so the overlay states are shared by the suspects
+    # with the same overrides: a node decided by the reevaluation for another suspect is not reevaluated again. The
+    # overlay states are evicted in the least recently used order when they hold more than overlay_cache_size outputs.
+    # An overlay state only reads the outputs of visited nodes in backward slices, which are closed under the inputs and
+    # never change once visited, so it stays valid when forward_analysis visits new nodes (see invalidate otherwise).
     def reevaluate(self, nodes_interested, node_interested, changed, override_dict):
-        back_up = {}
-        for son in nodes_interested:
-            u = self.node_by_name[son]
-            has_changed = False
-            for in_node_name in self.graph_backward[0][son]:  # only care about non_control edges
-                if in_node_name in changed:
-                    has_changed = True
-                    break
-
-            if has_changed:
-                back_up[son] = copy.deepcopy(self.node_output[son])
-                self.summary_node(son, u, override_dict)
-                changed.add(son)
+        key = (frozenset(changed), frozenset((name, x.left, x.right) for (name, x) in override_dict.items()))
+        if key in self.overlay_cache:
+            self.overlay_cache.move_to_end(key)
+        else:
+            self.overlay_cache[key] = (OverlayState(self.node_output), set(changed), set())
+        state, changed, decided = self.overlay_cache[key]
+        num_outputs = len(state.overlay)
+        for son in self.forward_cone(nodes_interested, node_interested, key[0]):
+            if son in decided:
+                continue
+            decided.add(son)
+            if changed.isdisjoint(self.dependencies(son)):
+                continue
 
-        ret = copy.deepcopy(self.node_output[node_interested])
-        # restore the back up
-        for key in back_up:
-            self.node_output[key] = back_up[key]
-        return ret
+            self.summary_node(son, override_dict, state)
+            if not (same_value(state[son].value, self.node_output[son].value) and same_array(
+                    state[son].array, self.node_output[son].array)):
+                changed.add(son)
 
-    # gets the corresponding abstracted output in node_output. It will also consider the specially instrumented name
-    # like "x|i" denoting the i-th element in the abstracted output.
-    def get_value(self, name):
+        self.overlay_cache_outputs += len(state.overlay) - num_outputs
+        while self.overlay_cache_outputs > overlay_cache_size and len(self.overlay_cache) > 1:
+            _, (evicted, _, _) = self.overlay_cache.popitem(last=False)
+            self.overlay_cache_outputs -= len(evicted.overlay)
+        return state[node_interested]
+
+    # gets the corresponding abstracted output in state (node_output by default). It will also consider the specially
+    # instrumented name like "x|i" denoting the i-th element in the abstracted output.
+    def get_value(self, name, state=None):
+        if state is None:
+            state = self.node_output
         if name.find("|") != -1:
             pos = name.find('|')
             index = int(name[pos + 1:])
-            return identity([self.node_output[name[:pos]].index_of(index)])
+            return identity([state[self.node_ids[name[:pos]]].index_of(index)])
         else:
-            return identity([self.node_output[name].index_of(None)])
+            return identity([state[self.node_ids[name]].index_of(None)])
 
     # computes the abstracted output of node_name using the tensor partition and the linear affine relation with values
-    # of some nodes overridden by override_dict . groups is the block_to_symbol field of the Array object.
-    def get_left_right(self, groups: dict, node_name, override_dict):
+    # of some nodes overridden by override_dict . groups is the block_to_symbol field of the Array object. The values of
+    # other nodes are read from state (node_output by default).
+    def get_left_right(self, groups: dict, node_name, override_dict, state=None):
         left = []
         right = []
         for key in groups:
@@ -585,7 +909,7 @@ class Graph:
                     return override_dict[name]
                 if (name, position) in override_dict:
                     return override_dict[(name, position)]
-                return self.get_value(name)
+                return self.get_value(name, state)
 
             def update_ele(factor, value, is_relu):
                 if is_relu:
@@ -668,11 +992,11 @@ class Graph:
 
     def get_info(self):
         variable_cnt = 0
-        for op in self.node_by_name:
-            if self.node_by_name[op].op.lower() in ["variablev2", "variable", "varhandleop"]:
-                u = self.node_output[op].size
-                if self.node_by_name[op].op.lower() == "varhandleop":
-                    u = shape_from_proto(self.node_by_name[op].attr["shape"].shape)
+        for (i, node) in enumerate(self.nodes):
+            if node.op.lower() in ["variablev2", "variable", "varhandleop"]:
+                u = self.node_output[i].size
+                if node.op.lower() == "varhandleop":
+                    u = shape_from_proto(node.attr["shape"].shape)
 
                 tmp = 1
                 if str(u) == '<unknown>':
@@ -681,9 +1005,9 @@ class Graph:
                     tmp *= int(x)
                 variable_cnt += tmp
 
-        return len(self.nodes_in_main_clique_topology), variable_cnt
+        return self.main_clique_size(), variable_cnt
 
 
 def main():
     graph = Graph("./test.pbtxt")
-    graph.backward_slice("Log", set())
+    graph.backward_slice(graph.node_ids["Log"])
@@ -0,0 +1,172 @@
+'''The range-spec files specifying the ranges of the inputs and weights of the networks without editing
+parse/specified_ranges.py. A range-spec file is a JSON or TOML (.toml) file like:
+
+{
+    "policy": "default",
+    "default": [-1, 1],
+    "dtypes": {"float32": [-1, 1], "int32": [0, null], "bool": [0, 1]},
+    "ranges": {"keep_prob": [0.5, 1], "input_*": [0, 255], "re:batch/.*_queue": [[-1, 1], [0, null]]},
+    "networks": {"TensorFuzz": {"Placeholder": [0, 1]}}
+}
+
+* "ranges" maps the nodes of every network to their ranges, and "networks" maps a network (the name of its file) to
+  the ranges of its own nodes. A node is matched by its name, by a glob pattern (a key containing *, ? or [), or by a
+  regular expression (a key starting with "re:") matching the whole name. A range is [left, right], where null (or
+  inf/-inf in TOML) means unbounded. The range of an iterator is a list of ranges, one per component, or a single
+  range shared by all components.
+* "dtypes" gives the ranges of the inputs of a data type which are not matched by any node.
+* "policy" decides the ranges of the remaining inputs: "prompt" (asking at the console), "fail" (raising an error),
+  "unbounded" or "default" (the range "default").'''
+
+import fnmatch
+import json
+import math
+import re
+
+from parse import shape_inference
+
+# the policies for the inputs whose ranges are not specified
+POLICIES = ["prompt", "fail", "unbounded", "default"]
+
+# maps the data types in types.proto to their names in range-spec files, e.g., DT_FLOAT to "float32"
+DTYPE_NAMES = {value: name[len("DT_"):].lower() for (name, value) in vars(shape_inference).items()
+               if name.startswith("DT_")}
+DTYPE_NAMES.update({shape_inference.DT_FLOAT: "float32", shape_inference.DT_DOUBLE: "float64",
+                    shape_inference.DT_HALF: "float16"})
+# the other names of the data types accepted in range-spec files
+DTYPE_ALIASES = {"float": "float32", "double": "float64", "half": "float16"}
+
+
+# returns the name of the data type dtype (an enum value of types.proto) in range-spec files.
+def dtype_name(dtype):
+    return DTYPE_NAMES.get(dtype, str(dtype))
+
+
+# returns a bound read from a range-spec file, where the infinite bounds are None.
+def parse_bound(x, where):
+    if x is None or (isinstance(x, float) and math.isinf(x)):
+        return None
+    if isinstance(x, bool) or not isinstance(x, (int, float)):
+        raise ValueError("%s: %r is not a number" % (where, x))
+    return x
+
+
+# returns the range read from a range-spec file: [left, right] or a list of them (only [left, right] if single is True).
+def parse_range(rng, where, single=False):
+    if isinstance(rng, list) and len(rng) > 0 and all(isinstance(x, list) for x in rng):
+        if single:
+            raise ValueError("%s: %r is not a single range [left, right]" % (where, rng))
+        return [parse_range(x, where) for x in rng]
+    if not isinstance(rng, list) or len(rng) != 2:
+        raise ValueError("%s: %r is not a range [left, right] or a list of ranges" % (where, rng))
+    left, right = parse_bound(rng[0], where), parse_bound(rng[1], where)
+    if left is not None and right is not None and left > right:
+        raise ValueError("%s: the range %r is empty" % (where, rng))
+    return [left, right]
+
+
+# checks whether the key of a range-spec file is a pattern rather than the name of a node.
+def is_pattern(key):
+    return key.startswith("re:") or any(c in key for c in "*?[")
+
+
+# returns the regular expression of a pattern (see is_pattern) matching the whole name.
+def pattern_regex(key):
+    return "(?:%s)\\Z" % key[len("re:"):] if key.startswith("re:") else fnmatch.translate(key)
+
+
+# maps the names of nodes to their ranges given by several sections, where a section is a dict from the names and
+# patterns of nodes to their ranges. The names are looked up first and then the patterns, both in the order of the
+# sections, so that a pattern never overrides a range given for the name. All patterns are compiled into one regular
+# expression, and the results are memoized, so that looking up the nodes of a large graph does not try the patterns
+# one by one for every node. It supports `in` and [] like the dict of ranges it replaces.
+class RangeTable:
+    def __init__(self, sections):
+        self.names = {}
+        patterns = []
+        self.pattern_ranges = []
+        for section in sections:
+            for (key, rng) in section.items():
+                if not is_pattern(key):
+                    self.names.setdefault(key, rng)
+                else:
+                    patterns.append("(?P<p%d>%s)" % (len(patterns), pattern_regex(key)))
+                    self.pattern_ranges.append(rng)
+        self.regex = re.compile("|".join(patterns)) if len(patterns) > 0 else None
+        self.memo = {}
+
+    # returns the range of the node name, or default if it is not matched.
+    def get(self, name, default=None):
+        if name in self.names:
+            return self.names[name]
+        if name not in self.memo:
+            match = None if self.regex is None else self.regex.match(name)
+            # the outermost group of the first matching pattern is the last group closed
+            self.memo[name] = None if match is None else self.pattern_ranges[int(match.lastgroup[1:])]
+        return default if self.memo[name] is None else self.memo[name]
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __getitem__(self, name):
+        rng = self.get(name)
+        if rng is None:
+            raise KeyError(name)
+        return rng
+
+
+# the contents of a range-spec file (see the top of this file)
+class RangeSpec:
+    def __init__(self, data, filename="<range spec>"):
+        unknown = set(data) - {"policy", "default", "dtypes", "ranges", "networks"}
+        if len(unknown) > 0:
+            raise ValueError("%s: unknown keys %s" % (filename, ", ".join(sorted(unknown))))
+        self.policy = data.get("policy", "prompt")
+        if self.policy not in POLICIES:
+            raise ValueError("%s: the policy %r is not one of %s" % (filename, self.policy, ", ".join(POLICIES)))
+        self.default = None
+        if data.get("default") is not None:
+            self.default = parse_range(data["default"], filename + ": default", True)
+        if self.policy == "default" and self.default is None:
+            raise ValueError("%s: the policy default requires a default range" % filename)
+        self.dtypes = {}
+        for (name, rng) in data.get("dtypes", {}).items():
+            self.dtypes[DTYPE_ALIASES.get(name, name)] = parse_range(rng, "%s: dtypes: %s" % (filename, name), True)
+        self.ranges = {key: parse_range(rng, "%s: ranges: %s" % (filename, key))
+                       for (key, rng) in data.get("ranges", {}).items()}
+        self.networks = {network: {key: parse_range(rng, "%s: networks: %s: %s" % (filename, network, key))
+                                   for (key, rng) in ranges.items()}
+                         for (network, ranges) in data.get("networks", {}).items()}
+        for (key, rng) in list(self.ranges.items()) + [x for ranges in self.networks.values() for x in ranges.items()]:
+            if is_pattern(key):
+                try:
+                    re.compile(pattern_regex(key))
+                except re.error as e:
+                    raise ValueError("%s: invalid pattern %s: %s" % (filename, key, e))
+
+    # returns the RangeTable of the network network_name, where builtin is the dict of its ranges in
+    # SpecifiedRanges.specified_ranges. The ranges of the network in the file come first, then the ranges of all
+    # networks in the file, and then builtin.
+    def table(self, network_name, builtin):
+        return RangeTable([self.networks.get(network_name, {}), self.ranges, builtin])
+
+
+# loads the range-spec file filename (None for no file), which is read as TOML if it ends with .toml and as JSON
+# otherwise. The policy of the file is replaced with policy if it is not None.
+def load(filename=None, policy=None):
+    data = {}
+    if filename is not None and filename.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            raise ImportError("reading a range-spec file in TOML requires Python 3.11 or later")
+        with open(filename, "rb") as f:
+            data = tomllib.load(f)
+    elif filename is not None:
+        with open(filename) as f:
+            data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("%s: a range-spec file must contain a JSON object or a TOML table" % filename)
+    if policy is not None:
+        data = dict(data, policy=policy)
+    return RangeSpec(data, filename or "<range spec>")
@@ -0,0 +1,981 @@
+'''https://github.com/tensorflow/tensorflow/blob/master/tensorflow/core/framework/types.proto
+https://github.com/tensorflow/tensorflow/blob/master/tensorflow/core/framework/tensor.proto
+https://github.com/tensorflow/tensorflow/tree/master/tensorflow/core/ops'''
+
+import numpy as np
+
+# the data types in types.proto
+DT_INVALID = 0
+DT_FLOAT = 1
+DT_DOUBLE = 2
+DT_INT32 = 3
+DT_UINT8 = 4
+DT_INT16 = 5
+DT_INT8 = 6
+DT_STRING = 7
+DT_COMPLEX64 = 8
+DT_INT64 = 9
+DT_BOOL = 10
+DT_QINT8 = 11
+DT_QUINT8 = 12
+DT_QINT32 = 13
+DT_BFLOAT16 = 14
+DT_QINT16 = 15
+DT_QUINT16 = 16
+DT_UINT16 = 17
+DT_COMPLEX128 = 18
+DT_HALF = 19
+DT_RESOURCE = 20
+DT_VARIANT = 21
+DT_UINT32 = 22
+DT_UINT64 = 23
+# the reference type of dtype is dtype + DT_REF_OFFSET, e.g., the output of VariableV2.
+DT_REF_OFFSET = 100
+
+
+# mimics tf.Dimension (TensorFlow v1), a dimension of a tensor shape whose value may be unknown (None).
+class Dimension:
+    def __init__(self, value):
+        self.value = None if value is None or int(value) < 0 else int(value)
+
+    def __int__(self):
+        if self.value is None:
+            raise TypeError("unknown dimension")
+        return self.value
+
+    def __index__(self):
+        return self.__int__()
+
+    def __str__(self):
+        return "?" if self.value is None else str(self.value)
+
+    def __repr__(self):
+        return "Dimension(%s)" % str(self.value)
+
+    def __eq__(self, other):
+        other = as_dimension(other)
+        if self.value is None or other.value is None:
+            return None
+        return self.value == other.value
+
+    def __ne__(self, other):
+        other = as_dimension(other)
+        if self.value is None or other.value is None:
+            return None
+        return self.value != other.value
+
+    def __lt__(self, other):
+        other = as_dimension(other)
+        if self.value is None or other.value is None:
+            return None
+        return self.value < other.value
+
+    def __le__(self, other):
+        other = as_dimension(other)
+        if self.value is None or other.value is None:
+            return None
+        return self.value <= other.value
+
+    def __gt__(self, other):
+        other = as_dimension(other)
+        if self.value is None or other.value is None:
+            return None
+        return self.value > other.value
+
+    def __ge__(self, other):
+        other = as_dimension(other)
+        if self.value is None or other.value is None:
+            return None
+        return self.value >= other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __add__(self, other):
+        other = as_dimension(other)
+        return Dimension(None if self.value is None or other.value is None else self.value + other.value)
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        other = as_dimension(other)
+        return Dimension(None if self.value is None or other.value is None else self.value - other.value)
+
+    def __rsub__(self, other):
+        return as_dimension(other).__sub__(self)
+
+    def __mul__(self, other):
+        other = as_dimension(other)
+        return Dimension(None if self.value is None or other.value is None else self.value * other.value)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __floordiv__(self, other):
+        other = as_dimension(other)
+        return Dimension(None if self.value is None or other.value is None else self.value // other.value)
+
+
+def as_dimension(value):
+    return value if isinstance(value, Dimension) else Dimension(value)
+
+
+# mimics tf.TensorShape (TensorFlow v1), the shape of a tensor whose rank (dims is None) or some dimensions may be
+# unknown. The analysis only relies on len(), indexing, slicing, iterating and str() of shapes.
+class TensorShape:
+    def __init__(self, dims):
+        self.dims = None if dims is None else [as_dimension(d) for d in dims]
+
+    @property
+    def ndims(self):
+        return None if self.dims is None else len(self.dims)
+
+    def __len__(self):
+        if self.dims is None:
+            raise ValueError("Cannot take the length of Shape with unknown rank.")
+        return len(self.dims)
+
+    def __iter__(self):
+        if self.dims is None:
+            raise ValueError("Cannot iterate over a shape with unknown rank.")
+        return iter(self.dims)
+
+    def __getitem__(self, key):
+        if self.dims is None:
+            if isinstance(key, slice):
+                return TensorShape(None)
+            return Dimension(None)
+        if isinstance(key, slice):
+            return TensorShape(self.dims[key])
+        return self.dims[key]
+
+    def __str__(self):
+        if self.dims is None:
+            return "<unknown>"
+        if len(self.dims) == 1:
+            return "(%s,)" % str(self.dims[0])
+        return "(%s)" % ", ".join(str(d) for d in self.dims)
+
+    def __repr__(self):
+        return "TensorShape(%s)" % (None if self.dims is None else [d.value for d in self.dims])
+
+    def is_fully_defined(self):
+        return self.dims is not None and all(d.value is not None for d in self.dims)
+
+    def as_list(self):
+        if self.dims is None:
+            raise ValueError("as_list() is not defined on an unknown TensorShape.")
+        return [d.value for d in self.dims]
+
+
+def unknown_shape(rank=None):
+    return TensorShape(None if rank is None else [None] * rank)
+
+
+# converts a TensorShapeProto into a TensorShape.
+def shape_from_proto(shape_proto):
+    if shape_proto.unknown_rank:
+        return TensorShape(None)
+    return TensorShape([d.size for d in shape_proto.dim])
+
+
+# maps the data types to numpy data types and the fields storing the values in TensorProto.
+_numpy_dtype = {DT_FLOAT: np.float32, DT_DOUBLE: np.float64, DT_INT32: np.int32, DT_UINT8: np.uint8,
+                DT_INT16: np.int16, DT_INT8: np.int8, DT_STRING: object, DT_COMPLEX64: np.complex64,
+                DT_INT64: np.int64, DT_BOOL: np.bool_, DT_QINT8: np.int8, DT_QUINT8: np.uint8, DT_QINT32: np.int32,
+                DT_BFLOAT16: np.float32, DT_QINT16: np.int16, DT_QUINT16: np.uint16, DT_UINT16: np.uint16,
+                DT_COMPLEX128: np.complex128, DT_HALF: np.float16, DT_UINT32: np.uint32, DT_UINT64: np.uint64}
+_value_field = {DT_FLOAT: "float_val", DT_DOUBLE: "double_val", DT_INT32: "int_val", DT_UINT8: "int_val",
+                DT_INT16: "int_val", DT_INT8: "int_val", DT_STRING: "string_val", DT_COMPLEX64: "scomplex_val",
+                DT_INT64: "int64_val", DT_BOOL: "bool_val", DT_QINT8: "int_val", DT_QUINT8: "int_val",
+                DT_QINT32: "int_val", DT_BFLOAT16: "half_val", DT_QINT16: "int_val", DT_QUINT16: "int_val",
+                DT_UINT16: "int_val", DT_COMPLEX128: "dcomplex_val", DT_HALF: "half_val", DT_UINT32: "uint32_val",
+                DT_UINT64: "uint64_val"}
+
+
+# converts a TensorProto into a numpy array, the same as tensor_util.MakeNdarray in TensorFlow.
+def make_ndarray(tensor):
+    dtype = tensor.dtype
+    if dtype not in _numpy_dtype:
+        raise TypeError("Unsupported tensor type: %d" % dtype)
+    shape = [d.size for d in tensor.tensor_shape.dim]
+    num_elements = int(np.prod(shape, dtype=np.int64))
+
+    if len(tensor.tensor_content) > 0:
+        if dtype == DT_BFLOAT16:  # bfloat16 is the higher half of float32
+            bits = np.frombuffer(tensor.tensor_content, dtype=np.uint16).astype(np.uint32) << 16
+            return bits.view(np.float32).reshape(shape)
+        return np.frombuffer(tensor.tensor_content, dtype=_numpy_dtype[dtype]).copy().reshape(shape)
+
+    values = list(getattr(tensor, _value_field[dtype]))
+    if dtype == DT_HALF:
+        values = np.array(values, dtype=np.uint16).view(np.float16)
+    elif dtype == DT_BFLOAT16:
+        values = (np.array(values, dtype=np.uint32) << 16).view(np.float32)
+    elif dtype in [DT_COMPLEX64, DT_COMPLEX128]:
+        values = np.array(values[0::2], dtype=_numpy_dtype[dtype]) + 1j * np.array(values[1::2])
+    else:
+        values = np.array(values, dtype=_numpy_dtype[dtype])
+
+    if num_elements == 0 or values.size == num_elements:
+        return values.astype(_numpy_dtype[dtype]).reshape(shape)
+    if values.size == 0:
+        return np.zeros(shape, dtype=_numpy_dtype[dtype])
+    # the last value is repeated to fill the tensor
+    return np.pad(values, (0, num_elements - values.size), "edge").astype(_numpy_dtype[dtype]).reshape(shape)
+
+
+# operations without outputs
+no_output_ops = {"NoOp", "Assert", "Save", "SaveV2", "SaveSlices", "ControlTrigger", "Abort", "AssignVariableOp",
+                 "AssignAddVariableOp", "AssignSubVariableOp", "DestroyResourceOp", "QueueEnqueueV2",
+                 "QueueEnqueueManyV2", "QueueCloseV2", "MakeIterator", "InitializeTableV2",
+                 "InitializeTableFromTextFileV2", "CreateSummaryFileWriter", "FlushSummaryWriter",
+                 "WriteScalarSummary", "WriteHistogramSummary", "WriteImageSummary", "WriteAudioSummary"}
+no_output_prefixes = ["ResourceApply", "ResourceSparseApply", "ResourceScatter"]
+
+
+def _list_len(node, key):
+    return len(node.attr[key].list.type)
+
+
+# the number of outputs of operations having more (or less) than one output. The numbers may depend on attributes.
+output_arity = {
+    "Switch": lambda node: 2,
+    "RefSwitch": lambda node: 2,
+    "Merge": lambda node: 2,
+    "RefMerge": lambda node: 2,
+    "Split": lambda node: node.attr["num_split"].i,
+    "SplitV": lambda node: node.attr["num_split"].i,
+    "Unpack": lambda node: node.attr["num"].i,
+    "IdentityN": lambda node: _list_len(node, "T"),
+    "IteratorGetNext": lambda node: _list_len(node, "output_types"),
+    "IteratorGetNextSync": lambda node: _list_len(node, "output_types"),
+    "QueueDequeueV2": lambda node: _list_len(node, "component_types"),
+    "QueueDequeueManyV2": lambda node: _list_len(node, "component_types"),
+    "QueueDequeueUpToV2": lambda node: _list_len(node, "component_types"),
+    "RestoreV2": lambda node: _list_len(node, "dtypes"),
+    "DecodeCSV": lambda node: _list_len(node, "OUT_TYPE"),
+    "DynamicPartition": lambda node: node.attr["num_partitions"].i,
+    "FusedBatchNorm": lambda node: 5,
+    "FusedBatchNormV2": lambda node: 5,
+    "FusedBatchNormV3": lambda node: 6,
+    "FusedBatchNormGrad": lambda node: 5,
+    "FusedBatchNormGradV2": lambda node: 5,
+    "FusedBatchNormGradV3": lambda node: 5,
+    "TopK": lambda node: 2,
+    "TopKV2": lambda node: 2,
+    "Unique": lambda node: 2,
+    "UniqueV2": lambda node: 2,
+    "UniqueWithCounts": lambda node: 3,
+    "ListDiff": lambda node: 2,
+    "BroadcastGradientArgs": lambda node: 2,
+    "MaxPoolWithArgmax": lambda node: 2,
+    "SoftmaxCrossEntropyWithLogits": lambda node: 2,
+    "SparseSoftmaxCrossEntropyWithLogits": lambda node: 2,
+    "CTCLoss": lambda node: 2,
+    "Svd": lambda node: 3,
+    "Qr": lambda node: 2,
+    "SelfAdjointEigV2": lambda node: 2,
+    "NonMaxSuppressionV4": lambda node: 2,
+    "NonMaxSuppressionV5": lambda node: 3,
+    "LogUniformCandidateSampler": lambda node: 3,
+    "UniformCandidateSampler": lambda node: 3,
+    "FixedUnigramCandidateSampler": lambda node: 3,
+    "LearnedUnigramCandidateSampler": lambda node: 3,
+    "AllCandidateSampler": lambda node: 3,
+    "TensorArrayV3": lambda node: 2,
+    "TensorArrayGradV3": lambda node: 2,
+    "TensorArrayConcatV3": lambda node: 2,
+    "ParseSingleExample": lambda node: 2 * node.attr["num_sparse"].i + _list_len(node, "sparse_types") + _list_len(
+        node, "Tdense"),
+    "ParseExample": lambda node: 2 * node.attr["Nsparse"].i + _list_len(node, "sparse_types") + _list_len(
+        node, "Tdense"),
+}
+
+
+# returns the number of outputs of node. max_consumed_index is the largest output index consumed by other nodes (-1
+# if none), which is only used for operations unknown to the table.
+def num_outputs(node, max_consumed_index=-1):
+    if node.op in output_arity:
+        return int(output_arity[node.op](node))
+    if node.op in no_output_ops:
+        return 0
+    for prefix in no_output_prefixes:
+        if node.op.startswith(prefix):
+            return 0
+    if "_output_shapes" in node.attr:
+        return max(len(node.attr["_output_shapes"].list.shape), max_consumed_index + 1)
+    return max(1, max_consumed_index + 1)
+
+
+bool_output_ops = {"Equal", "NotEqual", "Less", "LessEqual", "Greater", "GreaterEqual", "LogicalAnd", "LogicalOr",
+                   "LogicalNot", "IsFinite", "IsNan", "IsInf", "ApproximateEqual", "InTopK", "InTopKV2", "All", "Any",
+                   "IsVariableInitialized", "VarIsInitializedOp"}
+resource_output_ops = {"VarHandleOp", "OneShotIterator", "IteratorV2", "Iterator", "FIFOQueueV2",
+                       "PaddingFIFOQueueV2", "RandomShuffleQueueV2", "PriorityQueueV2", "HashTableV2",
+                       "MutableHashTableV2", "SummaryWriter"}
+ref_output_ops = {"VariableV2", "Variable", "TemporaryVariable"}
+
+
+def _attr_type(node, key, default=DT_INVALID):
+    if key in node.attr:
+        return node.attr[key].type
+    return default
+
+
+def _attr_types(node, key):
+    return list(node.attr[key].list.type)
+
+
+# returns the data types of the n outputs of node. input_dtypes contains the data types of its (non-control) inputs,
+# None for unknown.
+def output_dtypes(node, n, input_dtypes):
+    op = node.op
+    if n == 0:
+        return []
+    if op in bool_output_ops:
+        return [DT_BOOL] * n
+    if op in resource_output_ops:
+        return [DT_RESOURCE] * n
+    if op in ref_output_ops:
+        return [_attr_type(node, "dtype") + DT_REF_OFFSET] * n
+    if op in ["Shape", "ShapeN", "Size"]:
+        return [_attr_type(node, "out_type", DT_INT32)] * n
+    if op in ["Rank", "TensorArraySizeV3", "NonMaxSuppression", "NonMaxSuppressionV2", "NonMaxSuppressionV3"]:
+        return [DT_INT32] * n
+    if op == "Cast":
+        return [_attr_type(node, "DstT")]
+    if op in ["ArgMax", "ArgMin"]:
+        return [_attr_type(node, "output_type", DT_INT64)]
+    if op in ["Where", "Multinomial"]:
+        return [_attr_type(node, "output_dtype", DT_INT64)]
+    if op == "Range":
+        return [_attr_type(node, "Tidx", DT_INT32)]
+    if op in ["IteratorGetNext", "IteratorGetNextSync"]:
+        return _attr_types(node, "output_types")
+    if op in ["QueueDequeueV2", "QueueDequeueManyV2", "QueueDequeueUpToV2"]:
+        return _attr_types(node, "component_types")
+    if op == "RestoreV2":
+        return _attr_types(node, "dtypes")
+    if op == "IdentityN":
+        return _attr_types(node, "T")
+    if op == "DecodeCSV":
+        return _attr_types(node, "OUT_TYPE")
+    if op in ["Merge", "RefMerge"]:
+        return [_attr_type(node, "T"), DT_INT32]
+    if op in ["TopK", "TopKV2"]:
+        return [_attr_type(node, "T"), DT_INT32]
+    if op in ["Unique", "UniqueV2", "UniqueWithCounts", "ListDiff"]:
+        return [_attr_type(node, "T")] + [_attr_type(node, "out_idx", DT_INT32)] * (n - 1)
+    if op.startswith("FusedBatchNorm"):
+        return [_attr_type(node, "T")] + [_attr_type(node, "U", _attr_type(node, "T"))] * (n - 1)
+    if op.endswith("CandidateSampler"):
+        return [DT_INT64, DT_FLOAT, DT_FLOAT]
+    if op in ["TensorArrayV3", "TensorArrayGradV3"]:
+        return [DT_RESOURCE, DT_FLOAT]
+    if op in ["TensorArrayWriteV3", "TensorArrayScatterV3"]:
+        return [DT_FLOAT]
+    if op == "MaxPoolWithArgmax":
+        return [_attr_type(node, "T"), _attr_type(node, "Targmax", DT_INT64)]
+    if op == "ResourceGather":
+        return [_attr_type(node, "dtype")]
+    if op == "GatherV2":
+        return [_attr_type(node, "Tparams")]
+    if op in ["LoopCond"]:
+        return [DT_BOOL]
+    for key in ["T", "dtype", "out_type", "Tout", "output_dtype", "DstT"]:
+        if key in node.attr and node.attr[key].type != DT_INVALID:
+            return [node.attr[key].type] * n
+    # passes the data type of the first input through
+    if len(input_dtypes) > 0 and input_dtypes[0] is not None:
+        return [input_dtypes[0]] * n
+    return [DT_INVALID] * n
+
+
+unary_ops = {"Identity", "Abs", "Neg", "Exp", "Expm1", "Log", "Log1p", "Sqrt", "Rsqrt", "Square", "Reciprocal",
+             "Inv", "Relu", "Relu6", "Elu", "Selu", "LeakyRelu", "Sigmoid", "Tanh", "Softplus", "Softsign", "Floor",
+             "Ceil", "Round", "Rint", "Sign", "Sin", "Cos", "Tan", "Asin", "Acos", "Atan", "Sinh", "Cosh", "Erf",
+             "Erfc", "Lgamma", "Digamma", "StopGradient", "PreventGradient", "Snapshot", "ZerosLike", "OnesLike",
+             "Cast", "CheckNumerics", "IsFinite", "IsNan", "IsInf", "LogicalNot", "Softmax", "LogSoftmax", "Enter",
+             "RefEnter", "Exit", "RefExit", "NextIteration", "RefNextIteration", "LoopCond", "BiasAdd", "ClipByValue",
+             "Assign", "AssignAdd", "AssignSub", "Print", "MatrixBandPart", "LRN", "RandomShuffle", "Invert",
+             "FakeQuantWithMinMaxVars", "EnsureShape", "Bitcast", "PlaceholderWithDefault", "RefIdentity"}
+broadcast_ops = {"Add", "AddV2", "Sub", "Mul", "Div", "RealDiv", "FloorDiv", "FloorMod", "Mod", "TruncateDiv",
+                 "TruncateMod", "DivNoNan", "Maximum", "Minimum", "Pow", "SquaredDifference", "Equal", "NotEqual",
+                 "Less", "LessEqual", "Greater", "GreaterEqual", "LogicalAnd", "LogicalOr", "Atan2",
+                 "ApproximateEqual", "BitwiseAnd", "BitwiseOr", "BitwiseXor"}
+reduction_ops = {"Sum", "Mean", "Max", "Min", "Prod", "All", "Any", "EuclideanNorm"}
+attr_shape_ops = {"Placeholder", "PlaceholderV2", "VariableV2", "Variable", "TemporaryVariable"}
+
+
+def _known(shape):
+    return shape is not None and shape.dims is not None
+
+
+def _axis(axis, rank):
+    axis = int(axis)
+    return axis + rank if axis < 0 else axis
+
+
+def _broadcast(a, b):
+    if not _known(a) or not _known(b):
+        return unknown_shape()
+    a = a.dims
+    b = b.dims
+    if len(a) < len(b):
+        a, b = b, a
+    b = [Dimension(1)] * (len(a) - len(b)) + b
+    dims = []
+    for (x, y) in zip(a, b):
+        if x.value == 1:
+            dims.append(y)
+        elif y.value == 1 or y.value is None or x.value == y.value:
+            dims.append(x)
+        elif x.value is None:
+            dims.append(y)
+        else:
+            dims.append(Dimension(None))
+    return TensorShape(dims)
+
+
+# TensorFlow's default data format is NHWC.
+def _conv_output_size(size, ksize, stride, padding):
+    if size.value is None or ksize is None or ksize.value is None:
+        return Dimension(None)
+    if padding == b"VALID":
+        return Dimension((size.value - ksize.value + stride) // stride)
+    return Dimension((size.value + stride - 1) // stride)
+
+
+def _conv_like(node, x, ksizes, out_channels):
+    if not _known(x) or len(x.dims) != 4:
+        return unknown_shape(4)
+    strides = list(node.attr["strides"].list.i)
+    padding = node.attr["padding"].s
+    nchw = node.attr["data_format"].s == b"NCHW"
+    spatial = [2, 3] if nchw else [1, 2]
+    if len(strides) != 4:
+        return unknown_shape(4)
+    dims = list(x.dims)
+    for (t, i) in enumerate(spatial):
+        dims[i] = _conv_output_size(x.dims[i], ksizes[t], strides[i], padding)
+    dims[1 if nchw else 3] = as_dimension(out_channels)
+    return TensorShape(dims)
+
+
+def _conv2d(node, shapes, values):
+    x, w = shapes[0], shapes[1]
+    if not _known(w) or len(w.dims) != 4:
+        return [_conv_like(node, x, [None, None], None)]
+    return [_conv_like(node, x, w.dims[:2], w.dims[3])]
+
+
+def _depthwiseconv2dnative(node, shapes, values):
+    x, w = shapes[0], shapes[1]
+    if not _known(w) or len(w.dims) != 4:
+        return [_conv_like(node, x, [None, None], None)]
+    return [_conv_like(node, x, w.dims[:2], w.dims[2] * w.dims[3])]
+
+
+def _pool(node, shapes, values):
+    x = shapes[0]
+    ksize = list(node.attr["ksize"].list.i)
+    if not _known(x) or len(x.dims) != 4 or len(ksize) != 4:
+        return [unknown_shape(4)]
+    nchw = node.attr["data_format"].s == b"NCHW"
+    spatial = [2, 3] if nchw else [1, 2]
+    return [_conv_like(node, x, [Dimension(ksize[i]) for i in spatial], x.dims[1 if nchw else 3])]
+
+
+def _matmul(node, shapes, values):
+    a, b = shapes[0], shapes[1]
+    if not _known(a) or not _known(b) or len(a.dims) != 2 or len(b.dims) != 2:
+        return [unknown_shape(2)]
+    m = a.dims[1] if node.attr["transpose_a"].b else a.dims[0]
+    n = b.dims[0] if node.attr["transpose_b"].b else b.dims[1]
+    return [TensorShape([m, n])]
+
+
+def _batchmatmul(node, shapes, values):
+    a, b = shapes[0], shapes[1]
+    if not _known(a) or not _known(b) or len(a.dims) < 2 or len(b.dims) < 2:
+        return [unknown_shape()]
+    m = a.dims[-1] if node.attr["adj_x"].b else a.dims[-2]
+    n = b.dims[-2] if node.attr["adj_y"].b else b.dims[-1]
+    batch = _broadcast(TensorShape(a.dims[:-2]), TensorShape(b.dims[:-2]))
+    return [TensorShape(batch.dims + [m, n])]
+
+
+def _const(node, shapes, values):
+    return [shape_from_proto(node.attr["value"].tensor.tensor_shape)]
+
+
+def _attr_shape(node, shapes, values):
+    if "shape" not in node.attr:
+        return [unknown_shape()]
+    return [shape_from_proto(node.attr["shape"].shape)]
+
+
+def _placeholderwithdefault(node, shapes, values):
+    if "shape" in node.attr:
+        return [shape_from_proto(node.attr["shape"].shape)]
+    return [shapes[0]]
+
+
+def _shape(node, shapes, values):
+    if len(shapes) == 0 or not _known(shapes[0]):
+        return [unknown_shape(1)]
+    return [TensorShape([len(shapes[0].dims)])]
+
+
+def _shapen(node, shapes, values):
+    return [TensorShape([len(x.dims)]) if _known(x) else unknown_shape(1) for x in shapes]
+
+
+def _scalar(node, shapes, values):
+    return [TensorShape([])]
+
+
+def _reduction(node, shapes, values):
+    x = shapes[0]
+    keep_dims = node.attr["keep_dims"].b
+    if not _known(x) or values[1] is None:
+        return [unknown_shape(len(x.dims) if keep_dims and _known(x) else None)]
+    axes = set(_axis(a, len(x.dims)) for a in np.reshape(values[1], -1))
+    dims = []
+    for (i, d) in enumerate(x.dims):
+        if i in axes:
+            if keep_dims:
+                dims.append(Dimension(1))
+        else:
+            dims.append(d)
+    return [TensorShape(dims)]
+
+
+def _argmax(node, shapes, values):
+    x = shapes[0]
+    if not _known(x):
+        return [unknown_shape()]
+    if values[1] is None:
+        return [unknown_shape(len(x.dims) - 1)]
+    axis = _axis(np.reshape(values[1], -1)[0], len(x.dims))
+    return [TensorShape(x.dims[:axis] + x.dims[axis + 1:])]
+
+
+def _reshape(node, shapes, values):
+    x = shapes[0]
+    if values[1] is None:
+        if _known(shapes[1]) and shapes[1].dims[0].value is not None:
+            return [unknown_shape(shapes[1].dims[0].value)]
+        return [unknown_shape()]
+    target = [int(d) for d in np.reshape(values[1], -1)]
+    if -1 in target:
+        pos = target.index(-1)
+        rest = int(np.prod([d for d in target if d != -1]))
+        if x.is_fully_defined() and rest > 0:
+            target[pos] = int(np.prod(x.as_list())) // rest
+        else:
+            target[pos] = None
+    return [TensorShape(target)]
+
+
+def _expanddims(node, shapes, values):
+    x = shapes[0]
+    if not _known(x):
+        return [unknown_shape()]
+    if values[1] is None:
+        return [unknown_shape(len(x.dims) + 1)]
+    axis = _axis(np.reshape(values[1], -1)[0], len(x.dims) + 1)
+    return [TensorShape(x.dims[:axis] + [Dimension(1)] + x.dims[axis:])]
+
+
+def _squeeze(node, shapes, values):
+    x = shapes[0]
+    if not _known(x):
+        return [unknown_shape()]
+    axes = set(_axis(a, len(x.dims)) for a in node.attr["squeeze_dims"].list.i)
+    dims = []
+    for (i, d) in enumerate(x.dims):
+        if i in axes or (len(axes) == 0 and d.value == 1):
+            continue
+        if len(axes) == 0 and d.value is None:
+            return [unknown_shape()]
+        dims.append(d)
+    return [TensorShape(dims)]
+
+
+def _transpose(node, shapes, values):
+    x = shapes[0]
+    if not _known(x):
+        return [unknown_shape()]
+    if values[1] is None:
+        return [unknown_shape(len(x.dims))]
+    return [TensorShape([x.dims[int(p)] for p in np.reshape(values[1], -1)])]
+
+
+def _concatv2(node, shapes, values):
+    inputs = shapes[:-1]
+    if values[-1] is None or not all(_known(x) for x in inputs) or len(inputs) == 0:
+        known = [x for x in inputs if _known(x)]
+        return [unknown_shape(len(known[0].dims) if len(known) > 0 else None)]
+    rank = len(inputs[0].dims)
+    axis = _axis(np.reshape(values[-1], -1)[0], rank)
+    dims = list(inputs[0].dims)
+    for x in inputs[1:]:
+        dims[axis] = dims[axis] + x.dims[axis]
+    return [TensorShape(dims)]
+
+
+def _pack(node, shapes, values):
+    x = shapes[0]
+    if not _known(x):
+        return [unknown_shape()]
+    axis = _axis(node.attr["axis"].i, len(x.dims) + 1)
+    return [TensorShape(x.dims[:axis] + [Dimension(len(shapes))] + x.dims[axis:])]
+
+
+def _unpack(node, shapes, values):
+    x = shapes[0]
+    num = node.attr["num"].i
+    if not _known(x):
+        return [unknown_shape()] * num
+    axis = _axis(node.attr["axis"].i, len(x.dims))
+    return [TensorShape(x.dims[:axis] + x.dims[axis + 1:])] * num
+
+
+def _split(node, shapes, values):
+    num = node.attr["num_split"].i
+    x = shapes[1]
+    if not _known(x):
+        return [unknown_shape()] * num
+    if values[0] is None:
+        return [unknown_shape(len(x.dims))] * num
+    axis = _axis(np.reshape(values[0], -1)[0], len(x.dims))
+    dims = list(x.dims)
+    dims[axis] = Dimension(None if x.dims[axis].value is None else x.dims[axis].value // num)
+    return [TensorShape(dims)] * num
+
+
+def _splitv(node, shapes, values):
+    num = node.attr["num_split"].i
+    x = shapes[0]
+    if not _known(x):
+        return [unknown_shape()] * num
+    if values[1] is None or values[2] is None:
+        return [unknown_shape(len(x.dims))] * num
+    axis = _axis(np.reshape(values[2], -1)[0], len(x.dims))
+    sizes = [int(s) for s in np.reshape(values[1], -1)]
+    if -1 in sizes and x.dims[axis].value is not None:
+        sizes[sizes.index(-1)] = x.dims[axis].value - (sum(sizes) + 1)
+    rets = []
+    for size in sizes:
+        dims = list(x.dims)
+        dims[axis] = Dimension(None if size < 0 else size)
+        rets.append(TensorShape(dims))
+    return rets
+
+
+def _slice(node, shapes, values):
+    x = shapes[0]
+    if not _known(x):
+        return [unknown_shape()]
+    if values[1] is None or values[2] is None:
+        return [unknown_shape(len(x.dims))]
+    begin = np.reshape(values[1], -1)
+    size = np.reshape(values[2], -1)
+    dims = []
+    for i in range(len(x.dims)):
+        if size[i] != -1:
+            dims.append(Dimension(size[i]))
+        elif x.dims[i].value is None:
+            dims.append(Dimension(None))
+        else:
+            dims.append(Dimension(x.dims[i].value - begin[i]))
+    return [TensorShape(dims)]
+
+
+def _stridedslice(node, shapes, values):
+    x = shapes[0]
+    if not _known(x):
+        return [unknown_shape()]
+    if values[1] is None or values[2] is None or values[3] is None or node.attr["ellipsis_mask"].i != 0 or \
+            node.attr["new_axis_mask"].i != 0:
+        return [unknown_shape()]
+    begin = [int(v) for v in np.reshape(values[1], -1)]
+    end = [int(v) for v in np.reshape(values[2], -1)]
+    strides = [int(v) for v in np.reshape(values[3], -1)]
+    begin_mask = node.attr["begin_mask"].i
+    end_mask = node.attr["end_mask"].i
+    shrink_mask = node.attr["shrink_axis_mask"].i
+    dims = []
+    for i in range(len(x.dims)):
+        if i >= len(begin):
+            dims.append(x.dims[i])
+            continue
+        if shrink_mask & (1 << i):
+            continue
+        size = x.dims[i].value
+        if size is None or strides[i] == 0:
+            dims.append(Dimension(None))
+            continue
+        b = None if begin_mask & (1 << i) else begin[i]
+        e = None if end_mask & (1 << i) else end[i]
+        dims.append(Dimension(len(range(*slice(b, e, strides[i]).indices(size)))))
+    return [TensorShape(dims)]
+
+
+def _fill(node, shapes, values):
+    if values[0] is None:
+        if _known(shapes[0]) and shapes[0].dims[0].value is not None:
+            return [unknown_shape(shapes[0].dims[0].value)]
+        return [unknown_shape()]
+    return [TensorShape([int(d) for d in np.reshape(values[0], -1)])]
+
+
+def _tile(node, shapes, values):
+    x = shapes[0]
+    if not _known(x):
+        return [unknown_shape()]
+    if values[1] is None:
+        return [unknown_shape(len(x.dims))]
+    return [TensorShape([d * int(m) for (d, m) in zip(x.dims, np.reshape(values[1], -1))])]
+
+
+def _pad(node, shapes, values):
+    x = shapes[0]
+    if not _known(x):
+        return [unknown_shape()]
+    if values[1] is None:
+        return [unknown_shape(len(x.dims))]
+    paddings = np.reshape(values[1], (-1, 2))
+    return [TensorShape([d + int(p[0]) + int(p[1]) for (d, p) in zip(x.dims, paddings)])]
+
+
+def _gatherv2(node, shapes, values):
+    params, indices = shapes[0], shapes[1]
+    if not _known(params) or not _known(indices) or values[2] is None:
+        return [unknown_shape()]
+    axis = _axis(np.reshape(values[2], -1)[0], len(params.dims))
+    return [TensorShape(params.dims[:axis] + indices.dims + params.dims[axis + 1:])]
+
+
+def _onehot(node, shapes, values):
+    indices = shapes[0]
+    if not _known(indices):
+        return [unknown_shape()]
+    depth = None if values[1] is None else int(np.reshape(values[1], -1)[0])
+    axis = node.attr["axis"].i
+    axis = len(indices.dims) if axis == -1 else axis
+    return [TensorShape(indices.dims[:axis] + [Dimension(depth)] + indices.dims[axis:])]
+
+
+def _select(node, shapes, values):
+    return [_broadcast(shapes[1], shapes[2])]
+
+
+def _addn(node, shapes, values):
+    ret = shapes[0]
+    for x in shapes[1:]:
+        ret = _broadcast(ret, x)
+    return [ret]
+
+
+def _switch(node, shapes, values):
+    return [shapes[0], shapes[0]]
+
+
+def _merge(node, shapes, values):
+    for x in shapes:
+        if _known(x):
+            return [x, TensorShape([])]
+    return [unknown_shape(), TensorShape([])]
+
+
+def _fusedbatchnorm(node, shapes, values):
+    x = shapes[0]
+    channels = Dimension(None)
+    if _known(x) and len(x.dims) == 4:
+        channels = x.dims[1] if node.attr["data_format"].s == b"NCHW" else x.dims[3]
+    n = num_outputs(node)
+    return [x] + [TensorShape([channels])] * (n - 1)
+
+
+def _topkv2(node, shapes, values):
+    x = shapes[0]
+    if not _known(x):
+        return [unknown_shape(), unknown_shape()]
+    k = None if values[1] is None else int(np.reshape(values[1], -1)[0])
+    ret = TensorShape(x.dims[:-1] + [Dimension(k)])
+    return [ret, ret]
+
+
+def _where(node, shapes, values):
+    x = shapes[0]
+    return [TensorShape([None, None if not _known(x) else len(x.dims)])]
+
+
+def _range(node, shapes, values):
+    if values[0] is None or values[1] is None or values[2] is None:
+        return [unknown_shape(1)]
+    return [TensorShape([len(np.arange(np.reshape(values[0], -1)[0], np.reshape(values[1], -1)[0],
+                                       np.reshape(values[2], -1)[0]))])]
+
+
+def _resize(node, shapes, values):
+    x = shapes[0]
+    if values[1] is None:
+        size = [None, None]
+    else:
+        size = [int(s) for s in np.reshape(values[1], -1)]
+    if not _known(x) or len(x.dims) != 4:
+        return [TensorShape([None] + size + [None])]
+    return [TensorShape([x.dims[0]] + size + [x.dims[3]])]
+
+
+def _iteratorgetnext(node, shapes, values):
+    return [shape_from_proto(shape) for shape in node.attr["output_shapes"].list.shape]
+
+
+def _readvariableop(node, shapes, values):
+    # the shape of the variable is recorded in the VarHandleOp and is passed as values[0] (see handle_shapes)
+    return [unknown_shape() if values[0] is None else values[0]]
+
+
+def _resourcegather(node, shapes, values):
+    indices = shapes[1]
+    if values[0] is None or not _known(values[0]) or not _known(indices):
+        return [unknown_shape()]
+    return [TensorShape(indices.dims + values[0].dims[1:])]
+
+
+# the shape functions of operations, taking the node, the shapes and the constant values (None if not a constant) of
+# its inputs, and returning the list of shapes of its outputs.
+shape_fns = {
+    "Const": _const, "Placeholder": _attr_shape, "PlaceholderV2": _attr_shape, "VariableV2": _attr_shape,
+    "Variable": _attr_shape, "TemporaryVariable": _attr_shape, "PlaceholderWithDefault": _placeholderwithdefault,
+    "VarHandleOp": _scalar, "ReadVariableOp": _readvariableop, "ResourceGather": _resourcegather, "Shape": _shape,
+    "ShapeN": _shapen, "Rank": _scalar,
+    "Size": _scalar, "TensorArraySizeV3": _scalar, "MatMul": _matmul, "BatchMatMul": _batchmatmul,
+    "BatchMatMulV2": _batchmatmul, "Conv2D": _conv2d, "DepthwiseConv2dNative": _depthwiseconv2dnative,
+    "MaxPool": _pool, "AvgPool": _pool, "ArgMax": _argmax, "ArgMin": _argmax, "Reshape": _reshape,
+    "ExpandDims": _expanddims, "Squeeze": _squeeze, "Transpose": _transpose, "ConcatV2": _concatv2, "Pack": _pack,
+    "Unpack": _unpack, "Split": _split, "SplitV": _splitv, "Slice": _slice, "StridedSlice": _stridedslice,
+    "Fill": _fill, "Tile": _tile, "Pad": _pad, "MirrorPad": _pad, "GatherV2": _gatherv2, "OneHot": _onehot,
+    "Select": _select, "AddN": _addn, "Switch": _switch, "RefSwitch": _switch, "Merge": _merge, "RefMerge": _merge,
+    "FusedBatchNorm": _fusedbatchnorm, "FusedBatchNormV2": _fusedbatchnorm, "FusedBatchNormV3": _fusedbatchnorm,
+    "TopKV2": _topkv2, "Where": _where, "Range": _range, "ResizeBilinear": _resize,
+    "ResizeNearestNeighbor": _resize, "ResizeArea": _resize, "IteratorGetNext": _iteratorgetnext,
+    "IteratorGetNextSync": _iteratorgetnext,
+}
+shape_fns.update({op: _reduction for op in reduction_ops})
+
+
+# returns the shapes of the n outputs of node. shapes contains the shapes of its (non-control) inputs and values
+# contains their constant values (None if it is not a constant or unknown). The shapes recorded in the
+# "_output_shapes" attribute are preferred, otherwise they are inferred by the shape functions. Shapes that cannot be
+# inferred are unknown, which is always sound for the analysis.
+def output_shapes(node, n, shapes, values):
+    if n == 0:
+        return []
+    if "_output_shapes" in node.attr and len(node.attr["_output_shapes"].list.shape) == n:
+        return [shape_from_proto(shape) for shape in node.attr["_output_shapes"].list.shape]
+    shapes = [unknown_shape() if x is None else x for x in shapes]
+    try:
+        if node.op in shape_fns:
+            ret = shape_fns[node.op](node, shapes, values)
+        elif node.op in unary_ops and len(shapes) > 0:
+            ret = [shapes[0]] * n
+        elif node.op in broadcast_ops and len(shapes) == 2:
+            ret = [_broadcast(shapes[0], shapes[1])]
+        else:
+            ret = None
+    except (IndexError, ValueError, TypeError, KeyError):
+        ret = None
+    if ret is None or len(ret) != n:
+        return [unknown_shape() for _ in range(n)]
+    return ret
+
+
+# returns the constant value produced by node if it can be determined from the GraphDef, otherwise None. shapes are
+# the shapes of its inputs and values are the constant values of its inputs.
+def constant_value(node, shapes, values):
+    if node.op == "Const":
+        try:
+            return make_ndarray(node.attr["value"].tensor)
+        except TypeError:
+            return None
+    if node.op == "Shape" and len(shapes) > 0 and shapes[0] is not None and shapes[0].is_fully_defined():
+        return np.array(shapes[0].as_list(), dtype=np.int64 if _attr_type(node, "out_type") == DT_INT64 else np.int32)
+    if node.op in ["Identity", "StopGradient"] and len(values) > 0:
+        return values[0]
+    if node.op == "VarHandleOp":
+        # the shape of the variable behind the handle is passed to ReadVariableOp and ResourceGather
+        return shape_from_proto(node.attr["shape"].shape)
+    return None
+
+
+# infers the output signatures, i.e., lists of (shape, dtype) pairs, of all nodes, where nodes are identified by their
+# positions in the list nodes. inputs[i] is the list of (producer id, output index) of the non-control inputs of node i,
+# where the output index is None if the producer only has one output. arity[i] is the number of outputs of node i.
+# Nodes are visited in a depth-first post order of their inputs, and the inputs on a loop (NextIteration -> Merge) are
+# treated as unknown. Returns a list of the output signatures indexed by the node ids.
+def infer_output_signatures(nodes, inputs, arity):
+    n = len(nodes)
+    signatures = [None] * n
+    constants = [None] * n
+    state = [0] * n  # 1 for visiting, 2 for visited
+
+    def input_info(i, index):
+        if state[i] != 2:  # on a loop
+            return None, None, None
+        shapes, dtypes = signatures[i]
+        k = 0 if index is None else index
+        if k >= len(shapes):
+            return None, None, None
+        if index is None or index == 0:
+            value = constants[i]
+        else:
+            value = None
+        return shapes[k], dtypes[k], value
+
+    def visit(i):
+        node = nodes[i]
+        infos = [input_info(in_node, index) for (in_node, index) in inputs[i]]
+        shapes = [info[0] for info in infos]
+        dtypes = [info[1] for info in infos]
+        values = [info[2] for info in infos]
+        signatures[i] = (output_shapes(node, arity[i], shapes, values), output_dtypes(node, arity[i], dtypes))
+        constants[i] = constant_value(node, shapes, values)
+
+    for root in range(n):
+        if state[root] != 0:
+            continue
+        state[root] = 1
+        stack = [(root, 0)]
+        while len(stack) > 0:
+            i, k = stack[-1]
+            if k < len(inputs[i]):
+                stack[-1] = (i, k + 1)
+                in_node = inputs[i][k][0]
+                if state[in_node] == 0:
+                    state[in_node] = 1
+                    stack.append((in_node, 0))
+            else:
+                stack.pop()
+                visit(i)
+                state[i] = 2
+
+    return signatures
+
+
+# infers the output signatures by importing graph_def into TensorFlow, which is slower but uses the shape functions of
+# TensorFlow.
+def tensorflow_output_signatures(graph_def):
+    import tensorflow as tf
+    tf_graph = tf.Graph()
+    with tf_graph.as_default():
+        # graph_def may be parsed with the protocol buffers shipped with tensorboard (see parse/graph_loader.py)
+        tf.import_graph_def(tf.GraphDef.FromString(graph_def.SerializeToString()), name="")
+    return {op.name: ([tensor.shape for tensor in op.values()], [tensor.dtype for tensor in op.values()]) for op in
+            tf_graph.get_operations()}
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+# checks whether the operation named name is related to gradient descent, which is not interested by the analysis.
+def is_gradient(name):
+    name = name.lower()
+    return "gradient" in name and "stopgradient" not in name
+
+
+# indexes the backward slices (only non-control edges) of a set of root nodes in the main clique of graph, so that the
+# ordered slice of every root and whether it contains a gradient operation are answered by a cheap query instead of a
+# traversal, a scan of the names and a sort per root.
+# A node is in the backward slice of a root iff its strongly connected component (SCC) reaches the SCC of the root.
+# The set of roots reached by every SCC is a bitset computed once by propagating the bitsets backwards along the edges
+# between SCCs in the reversed topological order, and the bitsets are stored as a matrix of bytes (one row per SCC).
+class SliceIndex:
+    def __init__(self, graph, roots):
+        self.root_pos = {}
+        for root in roots:
+            if root not in self.root_pos and graph.scc_ids[root] >= 0:
+                self.root_pos[root] = len(self.root_pos)
+
+        scc_ids = graph.scc_ids
+        num_scc = int(scc_ids.max()) + 1
+        bits = [0] * num_scc
+        for (root, pos) in self.root_pos.items():
+            bits[scc_ids[root]] |= 1 << pos
+
+        # the edges between different SCCs go from a smaller SCC id to a larger one, so visiting them in the decreasing
+        # order of their sources finishes the bitset of an SCC before it is propagated to its predecessors.
+        forward = graph.forward[0]
+        src = scc_ids[np.repeat(np.arange(len(forward)), forward.degrees())]
+        dst = scc_ids[forward.indices]
+        mask = (src >= 0) & (dst >= 0) & (src != dst)
+        edges = np.unique(np.stack([src[mask], dst[mask]], axis=1), axis=0)
+        for (u, v) in edges[::-1].tolist():
+            bits[u] |= bits[v]
+
+        num_bytes = max(1, (len(self.root_pos) + 7) // 8)
+        self.reached = np.frombuffer(b"".join(x.to_bytes(num_bytes, "little") for x in bits), dtype=np.uint8).reshape(
+            num_scc, num_bytes)
+
+        # the nodes of the main clique in the topological order, and their SCCs
+        nodes = np.flatnonzero(graph.topological_order >= 0)
+        self.ordered_nodes = nodes[np.argsort(graph.topological_order[nodes], kind="stable")]
+        self.ordered_scc_ids = scc_ids[self.ordered_nodes]
+        self.gradient = np.array([is_gradient(name) for name in graph.node_names], dtype=bool)
+
+    def __contains__(self, root):
+        return root in self.root_pos
+
+    # returns the list of node ids in the backward slice of root in the topological order, and whether the slice
+    # contains an operation related to gradient descent.
+    def query(self, root):
+        pos = self.root_pos[root]
+        scc_in_slice = ((self.reached[:, pos >> 3] >> (pos & 7)) & 1).astype(bool)
+        nodes = self.ordered_nodes[scc_in_slice[self.ordered_scc_ids]]
+        return nodes.tolist(), bool(self.gradient[nodes].any())
@@ -1,4 +1,3 @@
-import z3
 import math
 import numpy as np
 from itertools import product
@@ -10,14 +9,14 @@ from utils import resolve_type
 magic = "$relu"
 
 
-# legacy class of z3-solver
+# legacy class of z3-solver. z3 is only imported when a symbolic variable or constraint is built.
 class Solver:
-    solver = z3.Solver()
     index = {}
     variable_by_name = {}
 
     @staticmethod
     def add_variable(name, dtype):
+        import z3
         if name not in Solver.index:
             Solver.index[name] = 0
         variable_name = name + "_" + str(Solver.index[name])
@@ -37,6 +36,7 @@ class Solver:
 
     @staticmethod
     def max(x, ys_):
+        import z3
         ys1 = [y for y in list(map(resolve_type, ys_)) if str(y) != 'inf']
         ys = [y for y in ys1 if str(y) != '-inf']
         if len(ys1) != len(ys_):
@@ -54,6 +54,7 @@ class Solver:
 
     @staticmethod
     def min(x, ys_):
+        import z3
         ys1 = [y for y in list(map(resolve_type, ys_)) if str(y) != '-inf']
         ys = [y for y in ys1 if str(y) != 'inf']
         if len(ys1) != len(ys_):
@@ -71,6 +72,7 @@ class Solver:
 
     @staticmethod
     def in_interval(x, interval):
+        import z3
         if isinstance(interval, tuple):
             if interval[0] > 0 or interval[1] > 0:
                 # (a, b]
@@ -135,6 +137,12 @@ class Range:
     def single(self):
         return self.left == self.right
 
+    # checks whether two Range objects are structurally equal. It is not __eq__ because Range objects are hashed by
+    # their identities.
+    def same(self, other):
+        return isinstance(other, Range) and _same_bound(self.left, other.left) and _same_bound(
+            self.right, other.right) and self.const_type == other.const_type
+
 
 class Linear:
     def __init__(self, e):
@@ -150,6 +158,10 @@ class Linear:
     def __str__(self):
         return "\t\tvalue: %s\n\t\tmap_to_index: %s" % (str(self.value), str(self.map_to_index))
 
+    # checks whether two Linear objects have the same factors and index mappings.
+    def same(self, other):
+        return self.value == other.value and self.map_to_index == other.map_to_index
+
     def __repr__(self):
         return "\t\tvalue: %s\n\t\tmap_to_index: %s" % (str(self.value), str(self.map_to_index))
 
@@ -334,6 +346,15 @@ class Array:
 
         return ret
 
+    # checks whether two Array objects have the same partitions and the same linear affine relations.
+    def same(self, other):
+        if self.index_slices != other.index_slices or self.block_to_symbol.keys() != other.block_to_symbol.keys():
+            return False
+        for key in self.block_to_symbol:
+            if not self.block_to_symbol[key].same(other.block_to_symbol[key]):
+                return False
+        return True
+
     def __str__(self):
         ret_str = ""
         for x in self.block_to_symbol:
@@ -349,9 +370,53 @@ class Array:
         return ret_str
 
 
+def _same_bound(a, b):
+    if a is None or b is None:
+        return a is b
+    try:
+        return bool(a == b)
+    except Exception:  # e.g., z3 expressions
+        return False
+
+
+# checks whether two abstracted values (Range objects, concrete values, or lists of them) are structurally equal. It
+# may return False for equal values it cannot compare, which is safe for its use in incremental reevaluation.
+def same_value(a, b):
+    if a is b:
+        return True
+    if isinstance(a, Range):
+        return a.same(b)
+    if isinstance(a, list) or isinstance(b, list):
+        return isinstance(a, list) and isinstance(b, list) and len(a) == len(b) and all(
+            same_value(x, y) for (x, y) in zip(a, b))
+    if a is None or b is None or isinstance(b, Range):
+        return False
+    try:
+        return np.array_equal(a, b) and np.shape(a) == np.shape(b)
+    except Exception:
+        return False
+
+
+# checks whether two tensor partitions (Array objects, lists of them, or None) are structurally equal.
+def same_array(a, b):
+    if a is b:
+        return True
+    if isinstance(a, list) or isinstance(b, list):
+        return isinstance(a, list) and isinstance(b, list) and len(a) == len(b) and all(
+            same_array(x, y) for (x, y) in zip(a, b))
+    if a is None or b is None:
+        return False
+    return a.same(b)
+
+
+# checks whether x is a constant number rather than a symbolic z3 expression
+def is_const(x):
+    return isinstance(x, (int, float, np.number))
+
+
 # checks whether a Range object has a const lower and upper bound
 def check_range_const(range_const: Range):
-    if z3.is_arith(range_const.left) or z3.is_arith(range_const.right):
+    if not all(x is None or is_const(x) for x in [range_const.left, range_const.right]):  # symbolic bounds
         return True
     return not (range_const.left is not None and range_const.right is not None and range_const.left > range_const.right)
 
@@ -364,6 +429,7 @@ def meet(range, range_const: Range):
 
     if range_const.const_type == 0:
         if isinstance(range, Range):
+            import z3
             if range_const.left is not None and range_const.right is not None:
                 return z3.Not(z3.Or(range_const.right < range.left, range.right < range_const.left))
             if range_const.right is not None:
@@ -385,7 +451,37 @@ def meet(range, range_const: Range):
         raise NotImplementedError
 
 
+# decides meet(range, range_const) on constant bounds without z3: returns whether the interval of `range` intersects
+# with the interval of `range_const` (see meet for a concrete value), or None if any bound is symbolic.
+def meet_const(range, range_const: Range):
+    if not all(x is None or is_const(x) for x in [range_const.left, range_const.right]):
+        return None
+    if not check_range_const(range_const):
+        return False
+    assert range_const.const_type is not None
+
+    if range_const.const_type == 0:
+        if isinstance(range, Range):
+            if not (is_const(range.left) and is_const(range.right)):
+                return None
+            if range_const.left is not None and range_const.right is not None:
+                return not (range_const.right < range.left or range.right < range_const.left)
+            if range_const.right is not None:
+                return bool(range.left <= range_const.right or range.right <= range_const.right)
+            if range_const.left is not None:
+                return bool(range_const.left <= range.left or range_const.left <= range.right)
+            else:
+                return True
+        elif isinstance(range, np.ndarray) or is_const(range):
+            return meet(range, range_const)
+        else:
+            return None
+    else:
+        raise NotImplementedError
+
+
 def meet_relation_variable(rv, range_const: Range):
+    import z3
     if not check_range_const(range_const):
         return False
     assert range_const.const_type is not None
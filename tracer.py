@@ -0,0 +1,128 @@
+import json
+import os
+import queue
+import sys
+import threading
+
+# the trace levels. A message is only formatted and written if its level is not larger than the current level.
+OFF = 0
+NODE = 1  # the names of the evaluated nodes and the messages of the analysis
+VALUE = 2  # also the abstracted outputs of the evaluated nodes, which are expensive to format
+
+LEVELS = {"off": OFF, "node": NODE, "value": VALUE}
+
+# the current trace level, which is OFF by default
+level = OFF
+
+_writer = None
+# maps a reason of a warning to the list of names of nodes warned for this reason
+_warnings = {}
+
+
+# writes the trace records to a file in a background thread, so that the analysis does not wait for the file. In the
+# jsonl format, every record is a JSON object in a line; otherwise the records are written as plain text lines.
+class TraceWriter:
+    def __init__(self, filename, jsonl):
+        self.file = sys.stderr if filename is None else open(filename, "w")
+        self.jsonl = jsonl
+        self.records = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            record = self.records.get()
+            if record is None:
+                break
+            if self.jsonl:
+                self.file.write(json.dumps(record) + "\n")
+            else:
+                self.file.write(" ".join(str(x) for x in record.values()) + "\n")
+
+    def close(self):
+        self.records.put(None)
+        self.thread.join()
+        if self.file is not sys.stderr:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+# sets the trace level (an integer or a key of LEVELS) and where the records are written: filename (stderr if None), in
+# the JSON lines format if filename ends with ".jsonl".
+def configure(new_level, filename=None):
+    global level, _writer
+    close()
+    level = LEVELS[new_level] if isinstance(new_level, str) else new_level
+    if level > OFF:
+        _writer = TraceWriter(filename, filename is not None and filename.endswith(".jsonl"))
+
+
+# checks whether the messages of trace_level are written. Callers should check it before formatting anything
+# expensive, e.g., if tracer.enabled(tracer.VALUE): tracer.trace(tracer.VALUE, "output", value=str(x)).
+def enabled(trace_level):
+    return level >= trace_level
+
+
+# writes a record of the event with fields if trace_level is enabled. The fields should already be formatted into
+# strings or numbers.
+def trace(trace_level, event, **fields):
+    if level >= trace_level and _writer is not None:
+        record = {"event": event}
+        record.update(fields)
+        _writer.records.put(record)
+
+
+# records that the analysis of node_name fails for reason. The warnings are aggregated and reported by summary instead
+# of being emitted one by one.
+def warn(reason, node_name):
+    _warnings.setdefault(reason, []).append(node_name)
+    trace(NODE, "warning", reason=reason, name=node_name)
+
+
+# returns the aggregated warnings as lines of text, e.g., "fail to analysis 3 nodes due to None: a, b, c". At most
+# max_names names of distinct nodes are listed for each reason.
+def summary(max_names=5):
+    lines = []
+    for reason in sorted(_warnings):
+        names = list(dict.fromkeys(_warnings[reason]))
+        lines.append("fail to analysis %d nodes due to %s: %s%s" % (
+            len(names), reason, ", ".join(names[:max_names]), ", ..." if len(names) > max_names else ""))
+    return lines
+
+
+def clear_warnings():
+    _warnings.clear()
+
+
+# returns the aggregated warnings and clears them, e.g., to send them from a worker process to the parent process.
+def take_warnings():
+    ret = dict(_warnings)
+    _warnings.clear()
+    return ret
+
+
+# adds the warnings returned by take_warnings.
+def merge_warnings(warnings):
+    for reason in warnings:
+        _warnings.setdefault(reason, []).extend(warnings[reason])
+
+
+# writes the pending records and closes the trace file.
+def close():
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+
+# a forked child process does not inherit the writer thread, so it forgets the writer of its parent without closing
+# it (closing would write the buffered records of the parent again). The child process does not write any trace, and
+# only aggregates its own warnings.
+def _after_fork_in_child():
+    global _writer
+    _writer = None
+    _warnings.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
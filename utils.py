@@ -1,5 +1,9 @@
 import numpy as np
 
+# the version of DEBAR. It is a part of the key of cached graphs, so it should be increased whenever the way of
+# building graphs changes.
+VERSION = "1.4.0"
+
 # the overflow and underflow limit in tf.float32. 
 OVERFLOW_LIMIT = 1e38
 UNDERFLOW_LIMIT = 1e-37
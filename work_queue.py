@@ -0,0 +1,156 @@
+import json
+import os
+import uuid
+
+# the subdirectories of a queue: the jobs not claimed yet, the jobs being run, and the records of the finished jobs
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+
+
+# returns the name of the job file of model in setting.
+def job_name(model, setting):
+    return "%s.%s.json" % (model, setting or "bounded")
+
+
+# writes data as JSON to path atomically: a temporary file is written first and then renamed, so that readers never
+# see a partially written file.
+def write_json(path, data):
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+# a work queue of models stored in the directory root, which can be shared by workers on several machines through a
+# shared filesystem without any broker. A job is a file moving from pending/ to claimed/ and its record is written to
+# done/:
+# * a worker claims a job by renaming it from pending/ to claimed/, which only succeeds for one worker, and writes a
+#   token of its own into the claimed file;
+# * the worker keeps touching the claimed file (the heartbeat), and a claimed file not touched for stale seconds is
+#   moved back to pending/ by any worker, so that the jobs of crashed workers are run again;
+# * the record of a finished job is written to done/ and the claimed file is removed, but only by the worker whose
+#   token is still in the claimed file. A worker which was only slow and lost its claim drops its record.
+# The heartbeats are compared with the time of the shared filesystem rather than the clocks of the workers, so that
+# the clocks of the machines need not agree.
+class WorkQueue:
+    def __init__(self, root, stale=60):
+        self.root = root
+        self.stale = stale
+        self.id = uuid.uuid4().hex
+        self.tokens = {}  # maps the jobs claimed by this worker to their tokens
+        for sub in [PENDING, CLAIMED, DONE]:
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    def path(self, sub, name):
+        return os.path.join(self.root, sub, name)
+
+    def names(self, sub):
+        return sorted(name for name in os.listdir(os.path.join(self.root, sub)) if name.endswith(".json"))
+
+    # adds the jobs of models in setting which are neither pending, claimed nor done. Returns the number of new jobs.
+    def enqueue(self, models, setting):
+        cnt = 0
+        for model in models:
+            name = job_name(model, setting)
+            if any(os.path.exists(self.path(sub, name)) for sub in [PENDING, CLAIMED, DONE]):
+                continue
+            write_json(self.path(PENDING, name), {"model": model, "setting": setting})
+            cnt += 1
+        return cnt
+
+    # claims a pending job. Returns (name, job) or None if there is no pending job.
+    def claim(self):
+        for name in self.names(PENDING):
+            try:
+                # the rename keeps the time of the pending file, which would otherwise look stale right away
+                os.utime(self.path(PENDING, name))
+                os.rename(self.path(PENDING, name), self.path(CLAIMED, name))
+                with open(self.path(CLAIMED, name)) as f:
+                    job = json.load(f)
+            except FileNotFoundError:  # claimed by another worker first, or reclaimed right after the rename
+                continue
+            job.pop("token", None)  # the token of a reclaimed claim
+            token = uuid.uuid4().hex
+            write_json(self.path(CLAIMED, name), dict(job, token=token))
+            self.tokens[name] = token
+            return name, job
+        return None
+
+    # checks whether the claimed file path carries the token of this worker for the job name.
+    def owns(self, path, name):
+        try:
+            with open(path) as f:
+                return json.load(f).get("token") == self.tokens.get(name)
+        except (FileNotFoundError, ValueError):
+            return False
+
+    # touches the claimed job name. Returns False if the job is no longer claimed by this worker.
+    def heartbeat(self, name):
+        if not self.owns(self.path(CLAIMED, name), name):
+            return False
+        try:
+            os.utime(self.path(CLAIMED, name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    # stores the record of the claimed job name and releases the claim. Returns False, dropping the record, if the job
+    # is no longer claimed by this worker.
+    def finish(self, name, record):
+        if not self.owns(self.path(CLAIMED, name), name):
+            self.tokens.pop(name, None)
+            return False
+        write_json(self.path(DONE, name), record)
+        # the claim is moved aside before it is removed, so that a claim taken over by another worker in the meantime is
+        # put back rather than removed
+        released = self.path(CLAIMED, "%s.%s.released" % (name, self.id))
+        try:
+            os.rename(self.path(CLAIMED, name), released)
+            if self.owns(released, name):
+                os.remove(released)
+            else:
+                os.rename(released, self.path(CLAIMED, name))
+        except FileNotFoundError:
+            pass
+        del self.tokens[name]
+        return True
+
+    # returns the current time of the filesystem of the queue, which is the time compared with the heartbeats.
+    def now(self):
+        probe = os.path.join(self.root, ".now.%s" % self.id)
+        with open(probe, "w"):
+            pass
+        try:
+            return os.path.getmtime(probe)
+        finally:
+            os.remove(probe)
+
+    # moves the claimed jobs whose heartbeats are older than stale seconds back to pending/. Returns the number of
+    # reclaimed jobs.
+    def reclaim_stale(self):
+        cnt = 0
+        now = self.now()
+        for name in self.names(CLAIMED):
+            try:
+                if now - os.path.getmtime(self.path(CLAIMED, name)) > self.stale:
+                    os.rename(self.path(CLAIMED, name), self.path(PENDING, name))
+                    cnt += 1
+            except FileNotFoundError:  # finished or reclaimed by another worker
+                continue
+        return cnt
+
+    # checks whether every job is done.
+    def is_complete(self):
+        return len(self.names(PENDING)) == 0 and len(self.names(CLAIMED)) == 0
+
+    # returns the records of the finished jobs.
+    def records(self):
+        ret = []
+        for name in self.names(DONE):
+            try:
+                with open(self.path(DONE, name)) as f:
+                    ret.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return ret